@@ -0,0 +1,48 @@
+"""
+Settings for API-only workers.
+
+Leaves out the admin, sessions, messages and CSRF protection, which only
+the admin and the browsable API use. Requests authenticate with tokens.
+
+Usage: DJANGO_SETTINGS_MODULE=app.api_settings gunicorn app.wsgi
+"""
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES, \
+    REST_FRAMEWORK
+
+BROWSER_ONLY_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS
+                  if app not in BROWSER_ONLY_APPS]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]]
+
+ROOT_URLCONF = 'app.api_urls'
+
+TEMPLATES = [dict(TEMPLATES[0], OPTIONS={
+    'context_processors': [
+        'django.template.context_processors.debug',
+        'django.template.context_processors.request',
+    ],
+})]
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_RENDERER_CLASSES=[
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+    DEFAULT_AUTHENTICATION_CLASSES=[
+        'user.authentication.ExpiringTokenAuthentication',
+    ],
+)
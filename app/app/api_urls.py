@@ -0,0 +1,15 @@
+"""API URL Configuration
+
+Routes only the API, for workers running with app.api_settings.
+"""
+from django.urls import path, include
+from django.conf.urls.static import static
+from django.conf import settings
+
+from core import views as core_views
+
+urlpatterns = [
+    path('api/user/', include('user.urls')),
+    path('api/recipe/', include('recipe.urls')),
+    path('metrics', core_views.metrics, name='metrics'),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -36,14 +37,18 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'rest_framework.authtoken',
-    'core',
-    'user',
-    'recipe'
+    'core.apps.CoreConfig',
+    'user.apps.UserConfig',
+    'recipe.apps.RecipeConfig'
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.SlowLogMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,6 +90,46 @@ DATABASES = {
     }
 }
 
+# Read replicas
+# Comma separated DB_REPLICA_HOSTS add replicas serving the reads of GET,
+# HEAD and OPTIONS requests. After a write, the client reads from the
+# primary for REPLICA_PIN_SECONDS; its user is pinned through the cache. A
+# replica not connected to within REPLICA_CONNECT_TIMEOUT is skipped for
+# REPLICA_RETRY_SECONDS
+
+REPLICA_CONNECT_TIMEOUT = 2
+REPLICA_DATABASES = []
+for number, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'],
+        HOST=host,
+        OPTIONS=dict(DATABASES['default'].get('OPTIONS', {}),
+                     connect_timeout=REPLICA_CONNECT_TIMEOUT),
+        TEST={'MIRROR': 'default'}
+    )
+    REPLICA_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+REPLICA_RETRY_SECONDS = 30
+
+# Cache
+# Each process keeps its own cache unless CACHE_LOCATION names a memcached
+# server they all share. Replica pins, cached users and the 'cache' throttle
+# backend only hold across processes and nodes with a shared cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.environ.get('CACHE_LOCATION'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ['CACHE_LOCATION'],
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -130,3 +175,162 @@ STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
 AUTH_USER_MODEL = 'core.User'
+
+# Token authentication
+# Lifetimes and intervals are in seconds
+
+ACCESS_TOKEN_LIFETIME = 5 * 60
+REFRESH_TOKEN_LIFETIME = 14 * 24 * 60 * 60
+TOKEN_REVOCATION_SYNC_INTERVAL = 5
+TOKEN_REVOCATION_SYNC_OVERLAP = 60
+TOKEN_REVOCATION_CAPACITY = 100000
+
+# REST framework
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'core.renderers.CompactJSONRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.ScopedRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '1000/min',
+        'write': '200/min',
+        'upload': '20/min',
+        'token': '60/min',
+    },
+    # Proxies in front of the app, whose X-Forwarded-For entries are trusted
+    # to identify anonymous clients. With none, the peer address is used
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'core.renderers.MessagePackRenderer'
+    )
+
+# Throttling
+# 'local' keeps token buckets in each process, 'cache' shares fixed window
+# counters through the default cache for multi-node deployments
+
+THROTTLE_BACKEND = 'local'
+
+# Response compression
+# Responses smaller than this many bytes are sent uncompressed
+
+COMPRESSION_MIN_SIZE = 1024
+
+# Background jobs
+# Delays are in seconds; a failed job waits JOB_RETRY_DELAY doubled per
+# attempt. Workers refresh the lock of their jobs every
+# JOB_HEARTBEAT_INTERVAL, and a job whose lock is older than JOB_TIMEOUT
+# is assumed lost with its worker and run again
+
+JOB_RETRY_DELAY = 10
+JOB_MAX_RETRY_DELAY = 60 * 60
+JOB_TIMEOUT = 10 * 60
+JOB_HEARTBEAT_INTERVAL = 60
+
+# Account deletion
+# A deleted account's rows are removed by a job this many per statement
+
+ACCOUNT_DELETION_BATCH_SIZE = 1000
+
+# Media storage
+# With OBJECT_STORAGE_BUCKET set, media is kept in an S3-compatible object
+# store and served from presigned URLs instead of MEDIA_ROOT. Sizes are in
+# bytes and the URL lifetime in seconds
+
+OBJECT_STORAGE_CLIENT = 'core.storage.S3Client'
+OBJECT_STORAGE = {
+    'BUCKET': os.environ.get('OBJECT_STORAGE_BUCKET'),
+    'ENDPOINT_URL': os.environ.get('OBJECT_STORAGE_ENDPOINT_URL'),
+    'REGION': os.environ.get('OBJECT_STORAGE_REGION'),
+    'ACCESS_KEY': os.environ.get('OBJECT_STORAGE_ACCESS_KEY'),
+    'SECRET_KEY': os.environ.get('OBJECT_STORAGE_SECRET_KEY'),
+}
+OBJECT_STORAGE_URL_EXPIRY = 60 * 60
+OBJECT_STORAGE_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+OBJECT_STORAGE_PART_SIZE = 8 * 1024 * 1024
+OBJECT_STORAGE_CONCURRENCY = 4
+
+if OBJECT_STORAGE['BUCKET']:
+    DEFAULT_FILE_STORAGE = 'core.storage.ObjectStorage'
+
+# Media collection
+# Images no recipe refers to are deleted once unmodified for MEDIA_MIN_AGE
+# seconds, as newer ones may belong to uploads still being saved
+
+MEDIA_MIN_AGE = 24 * 60 * 60
+
+# Image uploads
+# Checked from the image header before any pixel data is decoded
+
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Change log
+# Delta sync re-reads changes made up to CHANGE_LOG_OVERLAP seconds before
+# the sync token, which may have committed after it. prune_changes deletes
+# changes older than CHANGE_LOG_RETENTION seconds
+
+CHANGE_LOG_OVERLAP = 60
+CHANGE_LOG_RETENTION = 30 * 24 * 60 * 60
+
+# Recipe indexes
+# Per-user tag and ingredient indexes for similar and cookable recipes are
+# kept in each process for the most recent RECIPE_INDEX_CACHE_SIZE users,
+# updated from the change log and rebuilt after RECIPE_INDEX_MAX_AGE seconds
+
+RECIPE_INDEX_CACHE_SIZE = 1000
+RECIPE_INDEX_MAX_AGE = 10 * 60
+
+# Slow query logging
+# Thresholds are in milliseconds. Slow queries, without their parameters,
+# and requests are logged as JSON lines to stderr from a background thread.
+# SLOW_QUERY_EXPLAIN_RATE attaches the plan to that share of slow queries,
+# taken with another query on the request thread
+
+SLOW_QUERY_THRESHOLD = 100
+SLOW_QUERY_EXPLAIN_RATE = 0
+SLOW_REQUEST_THRESHOLD = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slowlog': {
+            'class': 'core.slowlog.BackgroundHandler',
+            'stream': 'ext://sys.stderr',
+        },
+    },
+    'loggers': {
+        'core.slowlog': {
+            'handlers': ['slowlog'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Request profiling
+# Staff can profile a request by adding the `profile` query parameter or an
+# X-Profile header. Its stack is sampled every PROFILE_INTERVAL seconds.
+# collect_media deletes stored profiles after PROFILE_RETENTION seconds
+
+PROFILE_INTERVAL = 0.001
+PROFILE_RETENTION = 7 * 24 * 60 * 60
+
+# Metrics
+# Served in the Prometheus text format at /metrics. With several worker
+# processes, set METRICS_DIR to a directory they all share, emptied when the
+# workers are restarted. When METRICS_TOKEN is set, scrapers must send it as
+# a bearer token
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 1
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
@@ -0,0 +1,26 @@
+"""
+Settings for running the test suite quickly.
+
+Usage: python manage.py test --settings=app.test_settings
+"""
+
+from app.settings import *  # noqa: F401,F403
+
+# Passwords are only hashed so tests can log in, not to be secure
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+# Uploaded files stay in memory instead of being written to MEDIA_ROOT
+DEFAULT_FILE_STORAGE = 'core.tests.storage.InMemoryStorage'
+
+# Runs test cases in parallel worker processes, each with its own test
+# database, and reports wall-clock time per test module
+TEST_RUNNER = 'core.test_runner.TimedTestRunner'
+
+# A second alias mirroring the test database, used by the read replica
+# routing tests. Reads only go to it when REPLICA_DATABASES lists it
+DATABASES['replica'] = dict(  # noqa: F405
+    DATABASES['default'],  # noqa: F405
+    TEST={'MIRROR': 'default'}
+)
@@ -3,11 +3,15 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext as _
 
 from core import models
+from core.paginator import EstimatedCountPaginator
 
 
 class UserAdmin(BaseUserAdmin):
     ordering = ['id']  # ordering list by id
     list_display = ['email', 'name']  # display with email, name
+    search_fields = ['^email']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Info'), {'fields': ('name',)}),
@@ -29,7 +33,39 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class UserOwnedAdmin(admin.ModelAdmin):
+    """Admin for large tables of objects owned by a user"""
+    ordering = ['-id']
+    list_display = ['name', 'user']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+    search_fields = ['^name']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class RecipeAdmin(UserOwnedAdmin):
+    list_display = ['title', 'user', 'time_minutes', 'price', 'created_at']
+    list_filter = ['created_at']
+    autocomplete_fields = ['user', 'tags', 'ingredients']
+    search_fields = ['^title']
+
+
+class AccountDeletionAdmin(admin.ModelAdmin):
+    """Read-only progress of account deletions"""
+    ordering = ['-id']
+    list_display = ['email', 'user_id', 'status', 'created', 'finished']
+    list_filter = ['status']
+    search_fields = ['^email']
+    readonly_fields = ['user_id', 'email', 'status', 'progress', 'created',
+                       'finished']
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
+admin.site.register(models.Tag, UserOwnedAdmin)
+admin.site.register(models.Ingredient, UserOwnedAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.AccountDeletion, AccountDeletionAdmin)
@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from core.models import Job
+
+
+registry = {}
+
+
+def task(name=None, max_attempts=None):
+    """Register a function as a task that can be enqueued by name"""
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        registry[task_name] = func
+        return func
+    return register
+
+
+class JobMetrics:
+    """Job outcome counts and run time per task in this process"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.seconds = defaultdict(float)
+
+    def clear(self):
+        self.counts.clear()
+        self.seconds.clear()
+
+    def record(self, name, outcome, elapsed):
+        self.counts[name, outcome] += 1
+        self.seconds[name] += elapsed
+
+    def summary(self):
+        """Return (name, succeeded, retried, failed, seconds) per task"""
+        return [
+            (name,
+             self.counts[name, 'succeeded'],
+             self.counts[name, 'retried'],
+             self.counts[name, 'failed'],
+             self.seconds[name])
+            for name in sorted(self.seconds)
+        ]
+
+
+metrics = JobMetrics()
+
+
+def enqueue(name, payload=None, key=None, delay=0):
+    """Queue a task by name, returning the job
+
+    Jobs sharing an idempotency `key` are only queued once; later calls
+    return the existing job. Called inside a transaction, the job is only
+    visible to workers once the transaction commits.
+    """
+    func = registry.get(name)
+    fields = {
+        'name': name,
+        'payload': json.dumps(payload or {}, cls=DjangoJSONEncoder),
+        'run_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if func is not None and func.max_attempts:
+        fields['max_attempts'] = func.max_attempts
+
+    if key is None:
+        return Job.objects.create(**fields)
+
+    job, _ = Job.objects.get_or_create(key=key, defaults=fields)
+    return job
+
+
+def backoff(attempts):
+    """Return the seconds to wait before retrying a failed attempt"""
+    return min(settings.JOB_RETRY_DELAY * 2 ** (attempts - 1),
+               settings.JOB_MAX_RETRY_DELAY)
+
+
+def claim(limit=1):
+    """Lock and mark running up to `limit` jobs that are due
+
+    Rows locked by other workers are skipped with
+    SELECT ... FOR UPDATE SKIP LOCKED, so workers never wait on each other.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.QUEUED,
+            run_at__lte=now
+        ).order_by('run_at')[:limit])
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=Job.RUNNING,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+
+    for job in jobs:
+        job.status = Job.RUNNING
+        job.locked_at = now
+        job.attempts += 1
+    return jobs
+
+
+def run(job):
+    """Run a claimed job, scheduling a retry if it fails"""
+    start = time.monotonic()
+    try:
+        func = registry.get(job.name)
+        if func is None:
+            raise LookupError(f'No task named {job.name}')
+        func(**json.loads(job.payload))
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=backoff(job.attempts)
+            )
+            outcome = 'retried'
+        else:
+            job.status = Job.FAILED
+            outcome = 'failed'
+    else:
+        job.status = Job.DONE
+        outcome = 'succeeded'
+
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_at', 'locked_at', 'last_error'])
+    metrics.record(job.name, outcome, time.monotonic() - start)
+    return outcome
+
+
+class Heartbeat(threading.Thread):
+    """Keep refreshing the lock of claimed jobs until they finish
+
+    A job is only assumed lost once its lock is JOB_TIMEOUT old, so long
+    jobs, and jobs waiting behind others claimed in the same batch, are
+    not requeued while their worker is alive.
+    """
+
+    def __init__(self, jobs, interval):
+        super().__init__(daemon=True)
+        self.pks = {job.pk for job in jobs}
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            while not self.done.wait(self.interval):
+                self.beat()
+        finally:
+            connections.close_all()
+
+    def beat(self):
+        with self.lock:
+            pks = list(self.pks)
+        if pks:
+            Job.objects.filter(pk__in=pks, status=Job.RUNNING).update(
+                locked_at=timezone.now()
+            )
+
+    def finish(self, job):
+        with self.lock:
+            self.pks.discard(job.pk)
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+def requeue_lost():
+    """Return jobs whose worker died mid-run to the queue, or fail them"""
+    lost = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT)
+    )
+    lost.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        locked_at=None,
+        last_error='Timed out'
+    )
+    return lost.update(status=Job.QUEUED, locked_at=None)
+
+
+def queue_depth():
+    """Return the number of jobs per (name, status)"""
+    return {
+        (row['name'], row['status']): row['count']
+        for row in Job.objects.values('name', 'status').annotate(
+            count=Count('id')
+        ).order_by()
+    }
+
+
+def work(should_stop=lambda: False, burst=False, poll_interval=1,
+         batch=1):
+    """Claim and run jobs until stopped, or until none are due if `burst`"""
+    while not should_stop():
+        requeue_lost()
+        jobs = claim(batch)
+        if not jobs:
+            if burst:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        heartbeat = Heartbeat(jobs, settings.JOB_HEARTBEAT_INTERVAL)
+        heartbeat.start()
+        try:
+            for job in jobs:
+                run(job)
+                heartbeat.finish(job)
+        finally:
+            heartbeat.stop()
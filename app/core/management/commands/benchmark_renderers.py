@@ -0,0 +1,71 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.middleware import CODECS
+
+
+def sample_recipes(count):
+    """Return count recipes shaped like RecipeSerializer output"""
+    return [
+        {
+            'id': i,
+            'title': f'Recipe number {i}',
+            'ingredients': [i * 3 + j for j in range(5)],
+            'tags': [i % 7, i % 11],
+            'time_minutes': 5 + i % 120,
+            'price': f'{(i % 10000) / 100:.2f}',
+            'link': f'https://example.com/recipes/{i}',
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    """Django command to compare renderer speed and size on recipe lists"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10, 100, 1000, 10000]
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        candidates = [
+            JSONRenderer(),
+            renderers.CompactJSONRenderer(),
+        ]
+        if renderers.msgpack is not None:
+            candidates.append(renderers.MessagePackRenderer())
+        codecs = [(name, codec) for name, codec in CODECS if codec]
+
+        header = ['size', 'format', 'encode ms', 'bytes']
+        header += [f'{name} bytes' for name, _ in codecs]
+        header += [f'{name} ms' for name, _ in codecs]
+        self.stdout.write('\t'.join(header))
+
+        for size in options['sizes']:
+            data = sample_recipes(size)
+            for renderer in candidates:
+                encode = min(timeit.repeat(
+                    lambda: renderer.render(data),
+                    number=1,
+                    repeat=options['repeat']
+                ))
+                content = renderer.render(data)
+
+                row = [str(size), renderer.format, f'{encode * 1000:.2f}',
+                       str(len(content))]
+                timings = []
+                for _, codec in codecs:
+                    row.append(str(len(codec(content))))
+                    elapsed = min(timeit.repeat(
+                        lambda: codec(content),
+                        number=1,
+                        repeat=options['repeat']
+                    ))
+                    timings.append(f'{elapsed * 1000:.2f}')
+                self.stdout.write('\t'.join(row + timings))
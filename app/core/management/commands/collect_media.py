@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe, delete_unused_images
+from core.profiling import PROFILE_DIRECTORY
+
+
+def walk(storage, path):
+    """Yield the names of all files below a storage directory"""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f'{path}/{name}'
+    for directory in directories:
+        yield from walk(storage, f'{path}/{directory}')
+
+
+def batches(iterable, size):
+    """Yield lists of up to `size` items from an iterable"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    """Django command to delete unreferenced images and expired profiles"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--min-age', type=int, default=settings.MEDIA_MIN_AGE,
+            help='Keep files modified less than this many seconds ago, '
+                 'which may belong to uploads still being saved'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        scanned = deleted = freed = 0
+
+        files = walk(storage, 'uploads/recipe')
+        for batch in batches(files, options['batch_size']):
+            scanned += len(batch)
+            removed = delete_unused_images(storage, batch, cutoff,
+                                           options['dry_run'])
+            deleted += len(removed)
+            freed += sum(removed.values())
+
+        expired = self.delete_expired_profiles(storage, options['dry_run'])
+        missing = self.count_missing(storage, options['batch_size'])
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} files. {verb} {deleted} orphaned files '
+            f'({freed} bytes)'
+        ))
+        if expired:
+            self.stdout.write(self.style.SUCCESS(
+                f'{verb} {expired} expired profiles'
+            ))
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f'{missing} recipes reference missing images'
+            ))
+
+    def delete_expired_profiles(self, storage, dry_run):
+        """Delete request profiles older than PROFILE_RETENTION"""
+        cutoff = timezone.now() - timedelta(
+            seconds=settings.PROFILE_RETENTION
+        )
+        expired = 0
+        for name in walk(storage, PROFILE_DIRECTORY):
+            if storage.get_modified_time(name) > cutoff:
+                continue
+            expired += 1
+            if not dry_run:
+                storage.delete(name)
+        return expired
+
+    def count_missing(self, storage, batch_size):
+        """Count recipes whose image is not in storage, in pk order"""
+        missing = 0
+        last_pk = 0
+        while True:
+            rows = list(Recipe.objects.filter(
+                pk__gt=last_pk
+            ).exclude(image='').exclude(image=None).order_by(
+                'pk'
+            ).values_list('pk', 'image')[:batch_size])
+            if not rows:
+                return missing
+
+            last_pk = rows[-1][0]
+            missing += sum(1 for _, name in rows if not storage.exists(name))
@@ -0,0 +1,134 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Tag, Ingredient, Recipe
+
+
+def partitioned_tables():
+    """Return (table, partition key column) for each table to partition
+
+    Recipes, tags and ingredients are partitioned by owner. Recipe tag and
+    ingredient rows have no owner column and are partitioned by recipe,
+    which is how they are always looked up.
+    """
+    tables = [(model._meta.db_table, 'user_id')
+              for model in (Recipe, Tag, Ingredient)]
+    for name in ('tags', 'ingredients'):
+        field = Recipe._meta.get_field(name)
+        tables.append((field.remote_field.through._meta.db_table,
+                       field.m2m_column_name()))
+    return tables
+
+
+def partition_statements(cursor, tables, partitions):
+    """Return the SQL converting tables to hash partitioned tables
+
+    Each table is renamed aside, recreated as a partitioned table with
+    the same columns and defaults, and filled from the old one. Its
+    constraints and indexes are recreated once the old tables are dropped,
+    with the partition key added to the primary key. Foreign keys between
+    partitioned tables are not recreated, since Postgres cannot reference
+    a partitioned table without its partition key.
+    """
+    qn = connection.ops.quote_name
+    partitioned = {table for table, _ in tables}
+    convert, recreate = [], []
+
+    for table, key in tables:
+        old = f'{table}_unpartitioned'
+        cursor.execute(
+            'SELECT conname, contype, pg_get_constraintdef(oid), '
+            'confrelid::regclass::text FROM pg_constraint '
+            'WHERE conrelid = %s::regclass ORDER BY conname',
+            [table]
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            'SELECT indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND tablename = %s '
+            'AND indexname NOT IN (SELECT conname FROM pg_constraint '
+            'WHERE conrelid = %s::regclass) ORDER BY indexname',
+            [table, table]
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+
+        convert += [
+            f'ALTER TABLE {qn(table)} RENAME TO {qn(old)}',
+            f'CREATE TABLE {qn(table)} (LIKE {qn(old)} INCLUDING DEFAULTS '
+            f'INCLUDING CONSTRAINTS) PARTITION BY HASH ({qn(key)})',
+        ]
+        convert += [
+            f'CREATE TABLE {qn(f"{table}_p{remainder}")} PARTITION OF '
+            f'{qn(table)} FOR VALUES WITH (MODULUS {partitions}, '
+            f'REMAINDER {remainder})'
+            for remainder in range(partitions)
+        ]
+        convert += [
+            f'INSERT INTO {qn(table)} SELECT * FROM {qn(old)}',
+            f'ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.{qn("id")}',
+        ]
+
+        for name, kind, definition, target in constraints:
+            if kind == 'p':
+                definition = f'PRIMARY KEY ({qn("id")}, {qn(key)})'
+            elif kind not in ('u', 'f') or target in partitioned:
+                continue
+            recreate.append(
+                f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} '
+                f'{definition}'
+            )
+        recreate += indexes
+
+    drop = 'DROP TABLE ' + ', '.join(
+        qn(f'{table}_unpartitioned') for table, _ in tables
+    )
+    return convert + [drop] + recreate
+
+
+class Command(BaseCommand):
+    """Django command to hash partition recipe tables by user
+
+    Run once, during a maintenance window: tables are locked and copied.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partitions', type=int, default=16)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Print the SQL without running it'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql' or \
+                connection.pg_version < 110000:
+            raise CommandError('Partitioning requires PostgreSQL 11 or later')
+        if options['partitions'] < 2:
+            raise CommandError('Use at least 2 partitions')
+
+        tables = partitioned_tables()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT partrelid::regclass::text FROM pg_partitioned_table'
+            )
+            done = {row[0] for row in cursor.fetchall()}
+            tables = [(table, key) for table, key in tables
+                      if table not in done]
+            if not tables:
+                self.stdout.write('Tables are already partitioned')
+                return
+
+            statements = partition_statements(cursor, tables,
+                                              options['partitions'])
+            for sql in statements:
+                if options['dry_run']:
+                    self.stdout.write(f'{sql};')
+                else:
+                    cursor.execute(sql)
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Partitioned {", ".join(table for table, _ in tables)} '
+                f'into {options["partitions"]} partitions each'
+            ))
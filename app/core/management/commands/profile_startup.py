@@ -0,0 +1,105 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter, so every import is timed from a cold start
+WORKER = '''
+import io
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+
+environ = {
+    'REQUEST_METHOD': 'GET',
+    'PATH_INFO': sys.argv[1],
+    'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80',
+    'SERVER_PROTOCOL': 'HTTP/1.1',
+    'HTTP_ACCEPT': 'application/json',
+    'wsgi.input': io.BytesIO(),
+    'wsgi.errors': sys.stderr,
+    'wsgi.url_scheme': 'http',
+}
+status = []
+response = application(environ, lambda code, headers: status.append(code))
+b''.join(response)
+response.close()
+served = time.perf_counter()
+
+print(json.dumps({
+    'setup': loaded - start,
+    'first_request': served - loaded,
+    'status': status[0],
+}))
+'''
+
+
+def parse_import_times(lines):
+    """Return (module, self us, cumulative us) from -X importtime output"""
+    timings = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        timings.append((
+            fields[2].strip(),
+            int(fields[0]),
+            int(fields[1]),
+        ))
+    return timings
+
+
+class Command(BaseCommand):
+    """Django command to profile worker cold start time"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/recipe/')
+        parser.add_argument('--top', type=int, default=20)
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        if options['settings']:
+            env['DJANGO_SETTINGS_MODULE'] = options['settings']
+
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', WORKER,
+             options['path']],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            env=env
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+
+        timings = parse_import_times(result.stderr.splitlines())
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+
+        total = sum(us for _, us, _ in timings)
+        self.stdout.write(f'modules imported\t{len(timings)}')
+        self.stdout.write(f'import ms\t{total / 1000:.1f}')
+        self.stdout.write(f'setup ms\t{report["setup"] * 1000:.1f}')
+        self.stdout.write(
+            f'first request ms\t{report["first_request"] * 1000:.1f}'
+            f'\t{report["status"]}'
+        )
+
+        self.stdout.write('\nself ms\tcumulative ms\tmodule')
+        slowest = sorted(timings, key=lambda t: t[1], reverse=True)
+        for module, self_us, cumulative_us in slowest[:options['top']]:
+            self.stdout.write(
+                f'{self_us / 1000:.1f}\t{cumulative_us / 1000:.1f}'
+                f'\t{module}'
+            )
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import Change
+
+
+class Command(BaseCommand):
+    """Django command to delete change log entries past their retention
+
+    The latest change of each user is kept, as it is the sync token of
+    clients that are up to date.
+    """
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            seconds=settings.CHANGE_LOG_RETENTION
+        )
+        latest = Change.objects.values('user').annotate(
+            last=Max('id')
+        ).values('last')
+        count, _ = Change.objects.filter(
+            created__lt=cutoff
+        ).exclude(id__in=latest).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {count} change log entries'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RefreshToken, RevokedToken
+
+
+class Command(BaseCommand):
+    """Django command to delete expired refresh and revoked tokens"""
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        refresh_count, _ = RefreshToken.objects.filter(
+            expires_at__lte=now
+        ).delete()
+        revoked_count, _ = RevokedToken.objects.filter(
+            expires_at__lte=now
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {refresh_count} refresh and '
+            f'{revoked_count} revoked tokens'
+        ))
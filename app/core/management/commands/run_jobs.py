@@ -0,0 +1,92 @@
+import multiprocessing
+import signal
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils.module_loading import autodiscover_modules
+
+from core import jobs
+
+
+@contextmanager
+def handle_signals(handler):
+    """Handle SIGTERM and SIGINT, restoring the previous handlers after"""
+    previous = {
+        signum: signal.signal(signum, handler)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    try:
+        yield
+    finally:
+        for signum, old in previous.items():
+            signal.signal(signum, old)
+
+
+class Command(BaseCommand):
+    """Django command to run background job workers"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--batch', type=int, default=1)
+        parser.add_argument('--poll-interval', type=float, default=1)
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no jobs are due instead of polling'
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Print the number of jobs per task and status, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write('task\tstatus\tjobs')
+            for (name, status), count in sorted(jobs.queue_depth().items()):
+                self.stdout.write(f'{name}\t{status}\t{count}')
+            return
+
+        autodiscover_modules('tasks')
+
+        if options['concurrency'] == 1:
+            self.work(options)
+            return
+
+        # Each worker process opens its own database connection
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=self.work, args=(options,))
+            for _ in range(options['concurrency'])
+        ]
+        for worker in workers:
+            worker.start()
+
+        def stop(signum, frame):
+            for worker in workers:
+                worker.terminate()
+
+        with handle_signals(stop):
+            for worker in workers:
+                worker.join()
+
+    def work(self, options):
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+
+        # Finish the current job before exiting
+        with handle_signals(stop):
+            jobs.work(
+                should_stop=lambda: bool(stopping),
+                burst=options['burst'],
+                poll_interval=options['poll_interval'],
+                batch=options['batch']
+            )
+
+        for name, succeeded, retried, failed, seconds in \
+                jobs.metrics.summary():
+            self.stdout.write(
+                f'{name}\t{succeeded} succeeded\t{retried} retried'
+                f'\t{failed} failed\t{seconds:.2f}s'
+            )
@@ -0,0 +1,239 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def format_labels(labels):
+    """Return labels in exposition format, e.g. {view="TagViewSet"}"""
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"')
+         .replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) \
+        + '}'
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}')
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def render(self, totals):
+        """Return exposition lines of this metric's samples in totals"""
+        return [f'{self.name}{format_labels(labels)} {format_value(value)}'
+                for (name, labels), value in sorted(totals.items())
+                if name == self.name]
+
+
+class Counter(Metric):
+    """A total that only goes up"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, self._labels(labels), amount)
+
+
+class Histogram(Metric):
+    """Counts of observed values in cumulative buckets, and their sum"""
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        samples = [(f'{self.name}_bucket', labels + (('le', le),), 1)
+                   for le, bound in self._bounds() if value <= bound]
+        samples += [
+            (f'{self.name}_count', labels, 1),
+            (f'{self.name}_sum', labels, value),
+        ]
+        self.registry.add_many(samples)
+
+    def _bounds(self):
+        return [(repr(float(bound)), bound) for bound in self.buckets] + \
+            [('+Inf', float('inf'))]
+
+    def render(self, totals):
+        lines = []
+        for (name, labels), count in sorted(totals.items()):
+            if name != f'{self.name}_count':
+                continue
+            for le, _ in self._bounds():
+                bucket_labels = labels + (('le', le),)
+                value = totals.get((f'{self.name}_bucket', bucket_labels), 0)
+                lines.append(f'{self.name}_bucket'
+                             f'{format_labels(bucket_labels)} '
+                             f'{format_value(value)}')
+            lines.append(f'{self.name}_count{format_labels(labels)} '
+                         f'{format_value(count)}')
+            value = totals.get((f'{self.name}_sum', labels), 0)
+            lines.append(f'{self.name}_sum{format_labels(labels)} '
+                         f'{format_value(value)}')
+        return lines
+
+
+class Registry:
+    """Metrics of all processes serving the API
+
+    Every sample is a total, so values from several processes are combined
+    by adding them up. Each process keeps its own in memory and, when
+    METRICS_DIR is set, writes them to a file of its own there at most
+    every METRICS_FLUSH_INTERVAL seconds. Scrapes add up all the files.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.values = {}
+        self.lock = threading.Lock()
+        self.pid = None
+        self.path = None
+        self.flushed = 0
+
+    def counter(self, *args, **kwargs):
+        return self._register(Counter(self, *args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self._register(Histogram(self, *args, **kwargs))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def _check_process(self):
+        """Start afresh in a new process, the parent keeps its own totals"""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.path = None
+            self.values = {}
+            atexit.register(self.flush)
+
+    def add(self, name, labels, amount):
+        self.add_many([(name, labels, amount)])
+
+    def add_many(self, samples):
+        with self.lock:
+            self._check_process()
+            for name, labels, amount in samples:
+                key = (name, labels)
+                self.values[key] = self.values.get(key, 0) + amount
+
+    def clear(self):
+        with self.lock:
+            self.values = {}
+
+    def flush(self, force=True):
+        """Write this process's totals to METRICS_DIR"""
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or self.pid != os.getpid() or (
+                not force and
+                now - self.flushed < settings.METRICS_FLUSH_INTERVAL):
+            return
+
+        with self.lock:
+            self.flushed = now
+            if self.path is None:
+                self.path = os.path.join(
+                    directory, f'{self.pid}-{uuid.uuid4().hex}.json'
+                )
+            samples = [[name, labels, value]
+                       for (name, labels), value in self.values.items()]
+
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f'{self.path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(samples, f)
+        os.replace(temp_path, self.path)
+
+    def collect(self):
+        """Return the totals of every process, keyed by (name, labels)"""
+        directory = settings.METRICS_DIR
+        if not directory:
+            with self.lock:
+                return dict(self.values)
+
+        self.flush()
+        totals = {}
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    samples = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            for sample_name, labels, value in samples:
+                key = (sample_name, tuple(map(tuple, labels)))
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def exposition(self):
+        """Return all metrics in the Prometheus text format"""
+        totals = self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.render(totals))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests = registry.counter(
+    'http_requests_total', 'HTTP requests handled',
+    ['view', 'action', 'method', 'status']
+)
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time taken to handle requests',
+    ['view', 'action']
+)
+db_queries = registry.counter(
+    'db_queries_total', 'Database queries run while handling requests',
+    ['view', 'action']
+)
+db_connections = registry.counter(
+    'db_connections_total', 'Database connections opened', ['database']
+)
+upload_bytes = registry.counter(
+    'upload_bytes_total', 'Bytes of files uploaded', ['view', 'action']
+)
+token_auth = registry.counter(
+    'token_auth_total', 'Token authentication attempts by outcome',
+    ['outcome']
+)
+
+
+def count_connection(sender, connection, **kwargs):
+    db_connections.inc(database=connection.alias)
@@ -0,0 +1,239 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from core import metrics, profiling, routers, slowlog
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _brotli(content):
+    return brotli.compress(content, quality=4)
+
+
+def _zstd(content):
+    return zstandard.ZstdCompressor(level=3).compress(content)
+
+
+# Codecs in order of server preference, used to break q-value ties
+CODECS = [
+    ('zstd', _zstd if zstandard else None),
+    ('br', _brotli if brotli else None),
+    ('gzip', compress_string),
+]
+
+
+def parse_accept_encoding(header):
+    """Return a dict mapping each coding in header to its q-value"""
+    codings = {}
+    for item in header.split(','):
+        parts = item.strip().split(';')
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+
+    return codings
+
+
+def negotiate_encoding(header):
+    """Return the best available (name, codec) for header, or None"""
+    codings = parse_accept_encoding(header)
+    best = None
+    for name, codec in CODECS:
+        if codec is None:
+            continue
+        quality = codings.get(name, codings.get('*', 0.0))
+        if quality > 0 and (best is None or quality > best[0]):
+            best = (quality, name, codec)
+
+    return best[1:] if best else None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with the best encoding the client accepts
+
+    Supports zstd and brotli when their packages are installed and gzip
+    otherwise. Responses below COMPRESSION_MIN_SIZE bytes are left as is.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        negotiated = negotiate_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if negotiated is None:
+            return response
+
+        name, codec = negotiated
+        compressed = codec(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = name
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        return response
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """Track each request so reads can be routed to replicas
+
+    Requests with unsafe methods, or carrying the pin cookie, use only the
+    primary. A request that writes pins its client with a cookie, and its
+    user in the cache, to the primary for REPLICA_PIN_SECONDS.
+    """
+
+    def process_request(self, request):
+        routers.begin_request(
+            request,
+            primary=request.method not in ('GET', 'HEAD', 'OPTIONS') or
+            routers.PIN_COOKIE in request.COOKIES
+        )
+
+    def process_response(self, request, response):
+        state = routers.end_request()
+        if state is None or not state.wrote:
+            return response
+
+        pin_seconds = settings.REPLICA_PIN_SECONDS
+        response.set_cookie(routers.PIN_COOKIE, '1', max_age=pin_seconds,
+                            httponly=True)
+        user = request.__dict__.get('user')
+        if user is not None and user.is_authenticated:
+            cache.set(routers.pin_key(user.pk), True, pin_seconds)
+        return response
+
+
+class SlowLogMiddleware:
+    """Log slow queries and requests with the view handling them
+
+    Times every statement run while the request is handled on any
+    database, and the request as a whole, against SLOW_QUERY_THRESHOLD and
+    SLOW_REQUEST_THRESHOLD milliseconds.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        context = slowlog.begin_request(request)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(
+                        slowlog.log_slow_queries
+                    ))
+                response = self.get_response(request)
+            duration = (time.perf_counter() - start) * 1000
+            slowlog.log_slow_request(context, response, duration)
+        finally:
+            slowlog.end_request()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slowlog.set_view(view_func, request)
+
+
+class MetricsMiddleware:
+    """Count requests, their latency, queries and uploads per view
+
+    Views are labelled by class name and viewset action. Query counts come
+    from the slow query log, so this runs inside SlowLogMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view, action = request.__dict__.get('metrics_view', ('', ''))
+        action = action or ''
+        metrics.requests.inc(view=view, action=action,
+                             method=request.method,
+                             status=response.status_code)
+        metrics.request_duration.observe(duration, view=view, action=action)
+        context = slowlog.current()
+        if context is not None and context.queries:
+            metrics.db_queries.inc(context.queries, view=view, action=action)
+        # Only count files the view parsed, without parsing any here
+        files = request.__dict__.get('_files')
+        if files:
+            metrics.upload_bytes.inc(
+                sum(f.size for _, uploads in files.lists() for f in uploads),
+                view=view, action=action
+            )
+        metrics.registry.flush(force=False)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = slowlog.describe_view(view_func,
+                                                     request.method)
+
+
+class ProfilingMiddleware:
+    """Profile requests by staff that ask for it
+
+    A request with the `profile` query parameter or an X-Profile header
+    from a staff user is sampled every PROFILE_INTERVAL seconds. The user
+    is authenticated before sampling starts, so other clients cannot add
+    profiling overhead. The response gets the time spent in the ORM,
+    serializers, rendering and authentication as Server-Timing metrics and
+    an X-Profile-URL to download the stacks as flamegraph text.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.requested(request) or \
+                not profiling.is_staff(request):
+            return self.get_response(request)
+
+        response, profile = profiling.profile(
+            lambda: self.get_response(request),
+            interval=settings.PROFILE_INTERVAL
+        )
+        timing = profile.server_timing()
+        if response.has_header('Server-Timing'):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response['Server-Timing'] = timing
+        response['X-Profile-URL'] = profiling.save(profile)
+        return response
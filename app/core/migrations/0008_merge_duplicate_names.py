@@ -0,0 +1,54 @@
+# Generated by Django 2.1.15 on 2026-10-18 23:39
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a name for the same user"""
+    Recipe = apps.get_model('core', 'Recipe')
+
+    for model_name, relation in (('Tag', 'tags'), ('Ingredient',
+                                                   'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+        column = f'{model_name.lower()}_id'
+
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=Min('id'),
+            count=Count('id')
+        ).filter(count__gt=1)
+
+        for duplicate in duplicates:
+            keep = duplicate['keep']
+            others = list(model.objects.filter(
+                user=duplicate['user'],
+                name=duplicate['name']
+            ).exclude(id=keep).values_list('id', flat=True))
+
+            # A recipe may link several of the duplicates, so link each
+            # recipe to the kept row once before dropping the others
+            recipes = set(through.objects.filter(
+                **{f'{column}__in': others}
+            ).values_list('recipe_id', flat=True))
+            recipes -= set(through.objects.filter(
+                **{column: keep}
+            ).values_list('recipe_id', flat=True))
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{column: keep})
+                for recipe_id in recipes
+            ])
+            through.objects.filter(**{f'{column}__in': others}).delete()
+            model.objects.filter(id__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+# Admin search uses istartswith, which Postgres runs as
+# UPPER(column::text) LIKE UPPER('term%'). These expression indexes let
+# those searches use an index scan.
+SEARCH_INDEXES = (
+    ('core_user_email_upper_like', 'core_user', 'email'),
+    ('core_tag_name_upper_like', 'core_tag', 'name'),
+    ('core_ingredient_name_upper_like', 'core_ingredient', 'name'),
+    ('core_recipe_title_upper_like', 'core_recipe', 'title'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'(UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_created_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
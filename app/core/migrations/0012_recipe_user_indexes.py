@@ -0,0 +1,47 @@
+# Generated by Django 2.1.15 on 2026-10-18 23:45
+
+from django.db import migrations, models
+
+
+def create_title_prefix_index(apps, schema_editor):
+    """Index the title prefix filter, which runs as UPPER(title) LIKE"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_user_title_upper_like '
+        'ON core_recipe (user_id, UPPER(title::text) text_pattern_ops)'
+    )
+
+
+def drop_title_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_user_title_upper_like')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'time_minutes'], name='recipe_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'price'], name='recipe_user_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'title'], name='recipe_user_title_idx'),
+        ),
+        migrations.RunPython(create_title_prefix_index,
+                             drop_title_prefix_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.1.15 on 2026-10-18 23:53
+
+import core.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=core.models.ContentAddressedImageField(db_index=True, null=True, upload_to=core.models.recipe_image_file_path),
+        ),
+    ]
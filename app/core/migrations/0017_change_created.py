@@ -0,0 +1,20 @@
+# Generated by Django 2.1.15 on 2026-10-19 11:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_revokedtoken_created'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -1,18 +1,84 @@
-import uuid
+import hashlib
 import os
+from datetime import timedelta
 
 from django.db import models
+from django.db.models.fields.files import ImageFieldFile
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                 PermissionsMixin
 from django.conf import settings
 
+from core.storage import touch
+
 
 def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image"""
-    ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
+    """Generate file path for a recipe image named by its content hash"""
+    return os.path.join('uploads/recipe/', filename[:2], filename)
+
+
+def file_digest(content):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedFieldFile(ImageFieldFile):
+    """Image file stored once per distinct content and shared by rows
+
+    The file is named by the hash of its contents, so saving a file that
+    is already stored only points the row at it. A file is referenced by
+    every row holding its name and is deleted with the last of them;
+    files left unreferenced otherwise are removed by `collect_media`.
+    """
+
+    def save(self, name, content, save=True):
+        ext = name.split('.')[-1].lower()
+        name = self.field.generate_filename(
+            self.instance,
+            f'{file_digest(content)}.{ext}'
+        )
+        if self.storage.exists(name):
+            # The file may be an orphan about to be collected; a fresh
+            # modified time makes collect_media keep it
+            touch(self.storage, name)
+        else:
+            name = self.storage.save(name, content,
+                                     max_length=self.field.max_length)
+
+        self.name = name
+        setattr(self.instance, self.field.name, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+    save.alters_data = True
 
-    return os.path.join('uploads/recipe/', filename)
+    def references(self):
+        """Return the number of other rows sharing this file"""
+        model = type(self.instance)
+        return model._default_manager.filter(
+            **{self.field.name: self.name}
+        ).exclude(pk=self.instance.pk).count()
+
+    def delete(self, save=True):
+        if self and self.references():
+            if hasattr(self, '_file'):
+                self.close()
+                del self.file
+            self.name = None
+            setattr(self.instance, self.field.name, self.name)
+            self._committed = False
+            if save:
+                self.instance.save()
+            return
+        super().delete(save)
+    delete.alters_data = True
+
+
+class ContentAddressedImageField(models.ImageField):
+    """Image field deduplicating files by their contents"""
+    attr_class = ContentAddressedFieldFile
 
 
 class UserManager(BaseUserManager):
@@ -57,6 +123,9 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        unique_together = ('user', 'name')
+
     def __str__(self):
         """String representation of objects of this class"""
         return self.name
@@ -70,6 +139,9 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        unique_together = ('user', 'name')
+
     def __str__(self):
         """String representation definition"""
         return self.name
@@ -81,6 +153,7 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -90,7 +163,200 @@ class Recipe(models.Model):
     # many-to-many relationships
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = ContentAddressedImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        db_index=True
+    )
+
+    class Meta:
+        # The filter indexes do not end in id, as a range on their column
+        # keeps them from returning rows in the default -id order anyway.
+        # Selective filters scan them and sort the few matches, while the
+        # user/id index serves unfiltered listings without a sort
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(fields=['user', 'time_minutes'],
+                         name='recipe_user_time_idx'),
+            models.Index(fields=['user', 'price'],
+                         name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'title'],
+                         name='recipe_user_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+def delete_unused_images(storage, names, cutoff, dry_run=False):
+    """Delete the image files in names that no recipe refers to
+
+    Files modified after cutoff are kept. An upload reusing a file touches
+    it before saving its recipe, so references and then the age are
+    checked again right before deleting. Returns the sizes of the deleted
+    files by name.
+    """
+    def referenced(candidates):
+        return set(Recipe.objects.filter(image__in=candidates).values_list(
+            'image', flat=True
+        ))
+
+    used = referenced(names)
+    old = [name for name in names if name not in used and
+           storage.get_modified_time(name) <= cutoff]
+    if not old:
+        return {}
+
+    used = referenced(old)
+    deleted = {}
+    for name in old:
+        if name in used or storage.get_modified_time(name) > cutoff:
+            continue
+        deleted[name] = storage.size(name)
+        if not dry_run:
+            storage.delete(name)
+    return deleted
+
+
+class RefreshToken(models.Model):
+    """Server-side refresh token used to issue new access tokens"""
+    digest = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='refresh_tokens'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.digest
+
+
+class RevokedToken(models.Model):
+    """Access token revoked before its expiry"""
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class Change(models.Model):
+    """Entry in the per-user change log used for delta sync"""
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    MODEL_CHOICES = (
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    model = models.CharField(max_length=16, choices=MODEL_CHOICES)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        index_together = ('user', 'id')
+
+    def __str__(self):
+        return f'{self.model}:{self.object_id}'
+
+
+def changes_since(user_id, cursor, limit):
+    """Return the user's changes around cursor, or None if it was pruned
+
+    Ids are taken when a change is inserted, but the change only shows
+    once its transaction commits, so one may appear behind a cursor that
+    was already handed out. Changes before the cursor created up to
+    CHANGE_LOG_OVERLAP seconds before the cursor's own change are read
+    again. Returns those and up to limit + 1 changes after the cursor,
+    each as (id, model, object_id, deleted) in id order.
+    """
+    changes = Change.objects.filter(user_id=user_id).order_by('id')
+    fields = ('id', 'model', 'object_id', 'deleted')
+    late = []
+    if cursor:
+        anchor = changes.filter(id=cursor).values_list(
+            'created', flat=True
+        ).first()
+        if anchor is None:
+            return None
+        late = list(changes.filter(
+            id__lt=cursor,
+            created__gte=anchor - timedelta(
+                seconds=settings.CHANGE_LOG_OVERLAP
+            )
+        ).values_list(*fields))
+
+    after = list(changes.filter(id__gt=cursor).values_list(*fields)
+                 [:limit + 1])
+    return late, after
+
+
+class Job(models.Model):
+    """Deferred task waiting in, or taken from, the job queue"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=255)
+    payload = models.TextField(default='{}')
+    key = models.CharField(max_length=255, unique=True, null=True,
+                           blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES,
+                              default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        index_together = ('status', 'run_at')
+
+    def __str__(self):
+        return f'{self.name}:{self.pk}'
+
+
+class AccountDeletion(models.Model):
+    """Removal of a deactivated user's data, carried out by a job
+
+    Kept after the user row is gone, so it holds the user's id and email
+    rather than a foreign key.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+    )
+
+    user_id = models.IntegerField(unique=True)
+    email = models.EmailField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES,
+                              default=PENDING)
+    progress = models.TextField(default='{}')
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.email}:{self.status}'
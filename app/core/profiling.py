@@ -0,0 +1,146 @@
+import collections
+import sys
+import threading
+import time
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from user.authentication import ExpiringTokenAuthentication
+
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_DIRECTORY = 'profiles'
+
+# Time in a frame of these modules is attributed to the category, the
+# innermost matching frame of each sample deciding, so queries run while
+# serializing count as ORM time
+CATEGORIES = [
+    ('orm', ('django.db.',)),
+    ('serializer', ('rest_framework.serializers', 'rest_framework.fields',
+                    'rest_framework.relations', 'recipe.serializers',
+                    'user.serializers')),
+    ('rendering', ('rest_framework.renderers', 'django.template.')),
+    ('auth', ('rest_framework.authentication', 'user.authentication',
+              'django.contrib.auth.')),
+]
+
+
+def requested(request):
+    """Return whether the client asked for request to be profiled"""
+    return PROFILE_PARAM in request.GET or PROFILE_HEADER in request.META
+
+
+def is_staff(request):
+    """Return whether request carries the access token of a staff user
+
+    Runs ahead of the view, and of the session middleware, so that
+    profiling starts only for staff.
+    """
+    api_request = Request(request,
+                          authenticators=[ExpiringTokenAuthentication()])
+    try:
+        user = api_request.user
+    except exceptions.APIException:
+        return False
+    return bool(user and user.is_staff)
+
+
+def categorize(module):
+    for category, prefixes in CATEGORIES:
+        if module.startswith(prefixes):
+            return category
+    return None
+
+
+class Sampler(threading.Thread):
+    """Sample the stack of another thread at a fixed interval
+
+    Stacks are recorded from the frame below `root`, weighted by the time
+    since the previous sample. The profiled thread only pays for the
+    sampler holding the GIL while it walks the stack.
+    """
+
+    def __init__(self, thread_id, root, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.categories = collections.Counter()
+        self.done = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.sample(frame, now - last)
+            last = now
+
+    def sample(self, frame, weight):
+        stack = []
+        category = None
+        while frame is not None and frame is not self.root:
+            module = frame.f_globals.get('__name__', '?')
+            stack.append(f'{module}:{frame.f_code.co_name}')
+            if category is None:
+                category = categorize(module)
+            frame = frame.f_back
+        if not stack:
+            return
+        self.stacks[';'.join(reversed(stack))] += weight
+        self.categories[category or 'other'] += weight
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+class Profile:
+    """Stacks and category totals sampled while handling a request"""
+
+    def __init__(self, sampler, duration):
+        self.stacks = sampler.stacks
+        self.categories = sampler.categories
+        self.duration = duration
+
+    def collapsed(self):
+        """Return the stacks in collapsed flamegraph format, in microseconds
+        """
+        return ''.join(f'{stack} {round(seconds * 1e6)}\n'
+                       for stack, seconds in sorted(self.stacks.items()))
+
+    def server_timing(self):
+        """Return a Server-Timing header value of the time per category"""
+        metrics = [f'{name};dur={seconds * 1000:.3f}'
+                   for name, seconds in sorted(self.categories.items())]
+        metrics.append(f'total;dur={self.duration * 1000:.3f}')
+        return ', '.join(metrics)
+
+
+def profile(func, interval=0.001):
+    """Call func under the sampler, returning its result and a Profile"""
+    sampler = Sampler(threading.get_ident(), sys._getframe(), interval)
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        result = func()
+    finally:
+        sampler.stop()
+    return result, Profile(sampler, time.perf_counter() - start)
+
+
+def save(profile):
+    """Store the profile as flamegraph text, returning its URL"""
+    name = default_storage.save(
+        f'{PROFILE_DIRECTORY}/{uuid.uuid4().hex}.txt',
+        ContentFile(profile.collapsed().encode())
+    )
+    return default_storage.url(name)
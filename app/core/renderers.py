@@ -0,0 +1,62 @@
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def to_columns(data):
+    """Recursively turn lists of same-shaped dicts into column/row form
+
+    `[{'id': 1, 'title': 'a'}, {'id': 2, 'title': 'b'}]` becomes
+    `{'columns': ['id', 'title'], 'rows': [[1, 'a'], [2, 'b']]}`, so the
+    keys are sent once per list instead of once per object.
+    """
+    if isinstance(data, dict):
+        return {key: to_columns(value) for key, value in data.items()}
+
+    if isinstance(data, (list, tuple)):
+        if data and all(isinstance(item, dict) for item in data):
+            columns = list(data[0])
+            if all(list(item) == columns for item in data):
+                return {
+                    'columns': columns,
+                    'rows': [[to_columns(item[key]) for key in columns]
+                             for item in data],
+                }
+        return [to_columns(item) for item in data]
+
+    return data
+
+
+class CompactJSONRenderer(renderers.JSONRenderer):
+    """Render JSON with lists of objects sent as columns and rows"""
+    media_type = 'application/vnd.compact+json'
+    format = 'cjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(
+            to_columns(data),
+            accepted_media_type,
+            renderer_context
+        )
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Render MessagePack, available when the msgpack package is installed"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+
+        return msgpack.packb(
+            data,
+            default=encoders.JSONEncoder().default,
+            use_bin_type=True
+        )
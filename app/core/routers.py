@@ -0,0 +1,102 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, OperationalError
+from django.utils.functional import LazyObject
+
+
+PIN_COOKIE = 'read_primary'
+
+_local = threading.local()
+
+
+def pin_key(user_id):
+    return f'core.routers.pin:{user_id}'
+
+
+class RequestState:
+    """Routing state of the request being handled on this thread"""
+
+    def __init__(self, request, primary=False):
+        self.request = request
+        self.primary = primary
+        self.wrote = False
+        self.user_checked = False
+        self.replica = None
+
+
+def begin_request(request, primary=False):
+    _local.state = RequestState(request, primary)
+
+
+def end_request():
+    """Forget and return the state of the finished request"""
+    state = getattr(_local, 'state', None)
+    _local.state = None
+    return state
+
+
+class ReplicaRouter:
+    """Route reads in safe-method requests to a replica
+
+    Writes, reads outside requests and every query of a request that
+    writes go to the primary. So do reads by a user or client pinned to the
+    primary after a recent write, so they always see their own writes.
+    """
+    down_until = {}
+
+    def db_for_read(self, model, **hints):
+        state = getattr(_local, 'state', None)
+        if state is None or self._use_primary(state):
+            return 'default'
+
+        if state.replica is None:
+            state.replica = self._choose_replica() or 'default'
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = getattr(_local, 'state', None)
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
+
+    def _use_primary(self, state):
+        if state.primary or state.wrote:
+            return True
+
+        # The user is known once the view authenticates the request, and
+        # is not looked up here to avoid querying while routing a query
+        user = state.request.__dict__.get('user')
+        if not state.user_checked and user is not None \
+                and not isinstance(user, LazyObject):
+            state.user_checked = True
+            if user.is_authenticated and cache.get(pin_key(user.pk)):
+                state.primary = True
+
+        return state.primary
+
+    def _choose_replica(self):
+        """Return a reachable replica, skipping those recently down"""
+        now = time.monotonic()
+        replicas = [alias for alias in settings.REPLICA_DATABASES
+                    if self.down_until.get(alias, 0) <= now]
+        random.shuffle(replicas)
+
+        for alias in replicas:
+            try:
+                connections[alias].ensure_connection()
+            except OperationalError:
+                self.down_until[alias] = \
+                    now + settings.REPLICA_RETRY_SECONDS
+                continue
+            return alias
+        return None
@@ -0,0 +1,219 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+
+query_logger = logging.getLogger('core.slowlog.query')
+request_logger = logging.getLogger('core.slowlog.request')
+
+_local = threading.local()
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime',
+}
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including extra fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        entry.update((key, value) for key, value in vars(record).items()
+                     if key not in RECORD_ATTRS)
+        return json.dumps(entry, default=str)
+
+
+class BackgroundHandler(QueueHandler):
+    """Write records as JSON lines from a background thread
+
+    The logging thread only puts records on a bounded queue. When the
+    writer falls behind and the queue is full, records are dropped and
+    counted instead of blocking. The writer thread is started lazily, so
+    each process forked after configuration gets its own.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream)
+        self.target.setFormatter(JSONFormatter())
+        self.dropped = 0
+        self.listener = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self.pid == os.getpid():
+            return
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.queue.maxsize)
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self.pid = os.getpid()
+            atexit.register(self.stop)
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Write out queued records and stop the writer thread"""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.pid = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+class RequestContext:
+    """What is known about the request being handled on this thread"""
+
+    def __init__(self, request):
+        self.request = request
+        self.view = None
+        self.action = None
+        self.queries = 0
+        self.query_time = 0.0
+
+    def as_dict(self):
+        request = self.request
+        user = request.__dict__.get('user')
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': self.view,
+            'action': self.action,
+            'user_id': getattr(user, 'pk', None),
+            'query_params': {key: request.GET.getlist(key)
+                             for key in request.GET},
+        }
+
+
+def begin_request(request):
+    _local.context = RequestContext(request)
+    return _local.context
+
+
+def end_request():
+    """Forget and return the context of the finished request"""
+    context = getattr(_local, 'context', None)
+    _local.context = None
+    return context
+
+
+def current():
+    """Return the context of the request handled on this thread, if any"""
+    return getattr(_local, 'context', None)
+
+
+def describe_view(view_func, method):
+    """Return the view class name and viewset action handling method"""
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None) or {}
+    return (view_class.__name__ if view_class else view_func.__name__,
+            actions.get(method.lower()))
+
+
+def set_view(view_func, request):
+    """Record the view class and viewset action about to handle request"""
+    context = current()
+    if context is not None:
+        context.view, context.action = describe_view(view_func,
+                                                     request.method)
+
+
+def explain(connection, sql, params):
+    """Return the plan of a query as text, or None if it can't be had"""
+    if not connection.features.supports_explaining_query_execution:
+        return None
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {sql}', params
+            )
+            return '\n'.join(' '.join(map(str, row))
+                             for row in cursor.fetchall())
+    except Exception:
+        return None
+    finally:
+        _local.explaining = False
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """Database execute wrapper logging statements over the threshold
+
+    Statements are logged without their parameters, which may hold
+    credentials or personal data. With SLOW_QUERY_EXPLAIN_RATE set, that
+    share of slow SELECT statements gets its plan attached. The plan is
+    taken on the request thread, delaying the response by another round
+    trip, so it is off unless enabled.
+    """
+    if getattr(_local, 'explaining', False):
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = (time.perf_counter() - start) * 1000
+
+    request = current()
+    if request is not None:
+        request.queries += 1
+        request.query_time += duration
+    if duration < settings.SLOW_QUERY_THRESHOLD:
+        return result
+
+    connection = context['connection']
+    fields = {
+        'sql': sql,
+        'duration_ms': round(duration, 3),
+        'database': connection.alias,
+        'plan': None,
+    }
+    rate = settings.SLOW_QUERY_EXPLAIN_RATE
+    if rate and not many and sql.lstrip()[:6].upper() == 'SELECT' and \
+            random.random() < rate:
+        fields['plan'] = explain(connection, sql, params)
+    if request is not None:
+        fields.update(request.as_dict())
+    query_logger.warning('slow query', extra=fields)
+    return result
+
+
+def log_slow_request(context, response, duration):
+    """Log a request that took longer than SLOW_REQUEST_THRESHOLD"""
+    if duration < settings.SLOW_REQUEST_THRESHOLD:
+        return
+    fields = context.as_dict()
+    fields.update({
+        'status': response.status_code,
+        'duration_ms': round(duration, 3),
+        'queries': context.queries,
+        'query_time_ms': round(context.query_time, 3),
+    })
+    request_logger.warning('slow request', extra=fields)
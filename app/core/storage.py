@@ -0,0 +1,223 @@
+import mimetypes
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils.module_loading import import_string
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+
+def touch(storage, name):
+    """Mark a stored file as modified now, so media GC keeps it for a while
+
+    Storages may implement `touch`; local files get their mtime set, and
+    files in other storages are left as they are.
+    """
+    if hasattr(storage, 'touch'):
+        storage.touch(name)
+        return
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        return
+    os.utime(path)
+
+
+class S3Client:
+    """Object store client for S3 and compatible services, using boto3"""
+
+    def __init__(self, bucket, endpoint_url=None, region=None,
+                 access_key=None, secret_key=None):
+        if boto3 is None:
+            raise ImproperlyConfigured(
+                'boto3 is required to keep media in an object store'
+            )
+        self.bucket = bucket
+        self.s3 = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key
+        )
+
+    def _content_type(self, key):
+        return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+    def put_object(self, key, body):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=body,
+                           ContentType=self._content_type(key))
+
+    def create_multipart_upload(self, key):
+        return self.s3.create_multipart_upload(
+            Bucket=self.bucket, Key=key, ContentType=self._content_type(key)
+        )['UploadId']
+
+    def upload_part(self, key, upload_id, number, body):
+        return self.s3.upload_part(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            PartNumber=number, Body=body
+        )['ETag']
+
+    def complete_multipart_upload(self, key, upload_id, etags):
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': [
+                {'ETag': etag, 'PartNumber': number}
+                for number, etag in enumerate(etags, 1)
+            ]}
+        )
+
+    def abort_multipart_upload(self, key, upload_id):
+        self.s3.abort_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id
+        )
+
+    def get_object(self, key):
+        return self.s3.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def head_object(self, key):
+        """Return the object's size and modified time, or None if missing"""
+        try:
+            head = self.s3.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+        return {'size': head['ContentLength'],
+                'modified': head['LastModified']}
+
+    def delete_object(self, key):
+        self.s3.delete_object(Bucket=self.bucket, Key=key)
+
+    def touch(self, key):
+        """Copy an object onto itself to update its modified time
+
+        Replacing the metadata is what makes S3 accept the copy, so the
+        object's current content type and metadata are sent again.
+        """
+        head = self.s3.head_object(Bucket=self.bucket, Key=key)
+        self.s3.copy_object(
+            Bucket=self.bucket, Key=key,
+            CopySource={'Bucket': self.bucket, 'Key': key},
+            MetadataDirective='REPLACE',
+            ContentType=head.get('ContentType', self._content_type(key)),
+            Metadata=head.get('Metadata', {})
+        )
+
+    def list_objects(self, prefix):
+        """Return the sub-prefixes and keys directly below a prefix"""
+        prefixes, keys = [], []
+        pages = self.s3.get_paginator('list_objects_v2').paginate(
+            Bucket=self.bucket, Prefix=prefix, Delimiter='/'
+        )
+        for page in pages:
+            prefixes += [p['Prefix'] for p in page.get('CommonPrefixes', [])]
+            keys += [obj['Key'] for obj in page.get('Contents', [])]
+        return prefixes, keys
+
+    def presign(self, key, expires):
+        return self.s3.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': key},
+            ExpiresIn=expires
+        )
+
+
+class ObjectStorage(Storage):
+    """File storage in an S3-compatible object store
+
+    Files up to OBJECT_STORAGE_MULTIPART_THRESHOLD are buffered and sent
+    in one request. Larger files are sent as a multipart upload with up to
+    OBJECT_STORAGE_CONCURRENCY parts in flight at once, so memory use stays
+    bounded by the part size. URLs are presigned, so clients download files
+    straight from the store.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            client = import_string(settings.OBJECT_STORAGE_CLIENT)(**{
+                key.lower(): value
+                for key, value in settings.OBJECT_STORAGE.items()
+            })
+        self.client = client
+
+    def _open(self, name, mode='rb'):
+        return ContentFile(self.client.get_object(name), name=name)
+
+    def _save(self, name, content):
+        if hasattr(content, 'seek'):
+            content.seek(0)
+
+        if content.size <= settings.OBJECT_STORAGE_MULTIPART_THRESHOLD:
+            self.client.put_object(name, content.read())
+        else:
+            self._save_multipart(name, content)
+        return name
+
+    def _save_multipart(self, name, content):
+        upload_id = self.client.create_multipart_upload(name)
+        concurrency = settings.OBJECT_STORAGE_CONCURRENCY
+        in_flight = threading.BoundedSemaphore(concurrency)
+        futures = []
+
+        try:
+            with ThreadPoolExecutor(concurrency) as executor:
+                number = 0
+                while True:
+                    in_flight.acquire()
+                    part = content.read(settings.OBJECT_STORAGE_PART_SIZE)
+                    if not part:
+                        in_flight.release()
+                        break
+                    number += 1
+                    future = executor.submit(self.client.upload_part, name,
+                                             upload_id, number, part)
+                    future.add_done_callback(lambda f: in_flight.release())
+                    futures.append(future)
+            etags = [future.result() for future in futures]
+        except BaseException:
+            self.client.abort_multipart_upload(name, upload_id)
+            raise
+
+        self.client.complete_multipart_upload(name, upload_id, etags)
+
+    def get_available_name(self, name, max_length=None):
+        # Objects are overwritten in place, and recipe images are named by
+        # their contents, so an existing name already holds the same file
+        return name
+
+    def delete(self, name):
+        self.client.delete_object(name)
+
+    def touch(self, name):
+        self.client.touch(name)
+
+    def exists(self, name):
+        return self.client.head_object(name) is not None
+
+    def size(self, name):
+        return self.client.head_object(name)['size']
+
+    def get_modified_time(self, name):
+        return self.client.head_object(name)['modified']
+
+    def url(self, name):
+        return self.client.presign(name, settings.OBJECT_STORAGE_URL_EXPIRY)
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/' if path else ''
+        prefixes, keys = self.client.list_objects(prefix)
+        return (
+            [p[len(prefix):].rstrip('/') for p in prefixes],
+            [key[len(prefix):] for key in keys],
+        )
@@ -0,0 +1,77 @@
+import time
+import unittest
+from collections import defaultdict
+
+from django.test.runner import DiscoverRunner, ParallelTestSuite, \
+                              RemoteTestResult, RemoteTestRunner, \
+                              default_test_processes
+
+
+class TimedRemoteTestResult(RemoteTestResult):
+    """Worker result that reports how long each test took"""
+
+    def startTest(self, test):
+        self._started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        self.events.append(('addDuration', self.test_index,
+                            time.perf_counter() - self._started))
+        super().stopTest(test)
+
+
+class TimedRemoteTestRunner(RemoteTestRunner):
+    resultclass = TimedRemoteTestResult
+
+
+class TimedParallelTestSuite(ParallelTestSuite):
+    runner_class = TimedRemoteTestRunner
+
+
+class TimedTextTestResult(unittest.TextTestResult):
+    """Text result that prints wall-clock time per test module"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.module_durations = defaultdict(float)
+        self._started = None
+        self._duration = None
+
+    def startTest(self, test):
+        self._started = time.perf_counter()
+        self._duration = None
+        super().startTest(test)
+
+    def addDuration(self, test, elapsed):
+        # Sent by parallel workers, whose replayed start/stop are instant
+        self._duration = elapsed
+
+    def stopTest(self, test):
+        elapsed = self._duration
+        if elapsed is None:
+            elapsed = time.perf_counter() - self._started
+        self.module_durations[type(test).__module__] += elapsed
+        super().stopTest(test)
+
+    def printErrors(self):
+        super().printErrors()
+        self.stream.writeln('\nTime per test module:')
+        for module, elapsed in sorted(self.module_durations.items(),
+                                      key=lambda item: -item[1]):
+            self.stream.writeln(f'{elapsed:8.3f}s  {module}')
+
+
+class TimedTestRunner(DiscoverRunner):
+    """Test runner reporting module timings, parallel across CPUs by default
+
+    Each parallel worker gets its own clone of the test database.
+    """
+    parallel_test_suite = TimedParallelTestSuite
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(parallel=default_test_processes())
+
+    def get_resultclass(self):
+        return super().get_resultclass() or TimedTextTestResult
@@ -1,26 +1,37 @@
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core import models
+from core.paginator import EstimatedCountPaginator
 
-class AdminSiteTests(TestCase):
 
-    def setUp(self):
-        """Preparation step before testing"""
+class AdminSiteTests(TestCase):
 
-        self.client = Client()
-        self.admin_user = get_user_model().objects.create_superuser(
+    @classmethod
+    def setUpTestData(cls):
+        """Create the users once for all tests"""
+        cls.admin_user = get_user_model().objects.create_superuser(
             email='admin@bocon.cloud',
             password='Password123'
         )
-        self.client.force_login(self.admin_user)  # Login
-        self.user = get_user_model().objects.create_user(
+        cls.user = get_user_model().objects.create_user(
             email='test@bocon.cloud',
             password='Password123',
             name='Test user full name'
         )
 
+    def setUp(self):
+        """Preparation step before testing"""
+
+        self.client = Client()
+        self.client.force_login(self.admin_user)  # Login
+
     def test_users_listed(self):
         """Test that users are listed on user page"""
         url = reverse('admin:core_user_changelist')
@@ -44,3 +55,71 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_recipe_changelist_queries(self):
+        """Test that the recipe list does not query users per row"""
+        for i in range(5):
+            user = get_user_model().objects.create_user(
+                email=f'user{i}@bocon.cloud',
+                password='Password123'
+            )
+            models.Recipe.objects.create(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=5
+            )
+        url = reverse('admin:core_recipe_changelist')
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, {'q': 'Recipe'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'user4@bocon.cloud')
+        self.assertLess(len(ctx.captured_queries), 10)
+
+    def test_tag_changelist(self):
+        """Test that the tag list page works"""
+        models.Tag.objects.create(user=self.user, name='Vegan')
+        url = reverse('admin:core_tag_changelist')
+        res = self.client.get(url)
+
+        self.assertContains(res, 'Vegan')
+
+    def test_user_autocomplete(self):
+        """Test that users can be searched by email for autocomplete"""
+        url = reverse('admin:core_user_autocomplete')
+        res = self.client.get(url, {'term': 'test'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, self.user.email)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    def test_exact_count_when_not_estimated(self):
+        """Test that small or filtered tables are counted exactly"""
+        get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='Password123'
+        )
+        queryset = get_user_model().objects.order_by('id')
+
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 1)
+        self.assertEqual(
+            EstimatedCountPaginator(queryset.filter(id=0), 10).count, 0
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+    def test_estimated_count_for_large_table(self):
+        """Test that the planner estimate is used for large tables"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_user')
+        queryset = get_user_model().objects.order_by('id')
+        paginator = EstimatedCountPaginator(queryset, 10)
+        paginator.estimate_threshold = -1
+
+        with CaptureQueriesContext(connection) as ctx:
+            paginator.count
+
+        self.assertNotIn('COUNT', ctx.captured_queries[0]['sql'].upper())
@@ -0,0 +1,33 @@
+from django.test import SimpleTestCase
+
+from app import api_settings
+
+
+class ApiSettingsTests(SimpleTestCase):
+
+    def test_browser_only_apps_left_out(self):
+        """Test that API workers skip the admin, sessions and messages"""
+        for app in ('django.contrib.admin', 'django.contrib.sessions',
+                    'django.contrib.messages'):
+            self.assertNotIn(app, api_settings.INSTALLED_APPS)
+        self.assertIn('core.apps.CoreConfig', api_settings.INSTALLED_APPS)
+
+    def test_session_middleware_left_out(self):
+        """Test that API workers skip session and CSRF middleware"""
+        self.assertFalse([
+            middleware for middleware in api_settings.MIDDLEWARE
+            if 'sessions' in middleware or 'csrf' in middleware
+            or 'messages' in middleware
+        ])
+        self.assertIn('core.middleware.CompressionMiddleware',
+                      api_settings.MIDDLEWARE)
+
+    def test_token_authentication_only(self):
+        """Test that API workers only authenticate tokens"""
+        rest_framework = api_settings.REST_FRAMEWORK
+
+        self.assertEqual(rest_framework['DEFAULT_AUTHENTICATION_CLASSES'],
+                         ['user.authentication.ExpiringTokenAuthentication'])
+        self.assertNotIn('rest_framework.renderers.BrowsableAPIRenderer',
+                         rest_framework['DEFAULT_RENDERER_CLASSES'])
+        self.assertEqual(api_settings.ROOT_URLCONF, 'app.api_urls')
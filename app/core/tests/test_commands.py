@@ -1,8 +1,26 @@
+from datetime import timedelta
+from io import StringIO
+from subprocess import CompletedProcess
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command, CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.management.commands.profile_startup import parse_import_times
+from core.models import Change, Recipe, RevokedToken
+
+
+DAY = timedelta(days=1)
+
+# Files in memory record their modified time, which the tests backdate
+in_memory_storage = override_settings(
+    DEFAULT_FILE_STORAGE='core.tests.storage.InMemoryStorage'
+)
 
 
 class CommandTest(TestCase):
@@ -23,3 +41,177 @@ class CommandTest(TestCase):
             call_command('wait_for_db')
 
             self.assertEqual(gi.call_count, 6)
+
+    def test_prune_tokens(self):
+        """Test that only expired tokens are pruned"""
+        now = timezone.now()
+        RevokedToken.objects.create(jti='old', expires_at=now - DAY)
+        RevokedToken.objects.create(jti='new', expires_at=now + DAY)
+
+        call_command('prune_tokens', stdout=StringIO())
+
+        self.assertEqual(
+            list(RevokedToken.objects.values_list('jti', flat=True)),
+            ['new']
+        )
+
+    def test_prune_changes(self):
+        """Test that old changes are pruned except each user's latest"""
+        user = get_user_model().objects.create_user('test@bocon.cloud')
+        old = Change.objects.create(user=user, model=Change.TAG,
+                                    object_id=1)
+        new = Change.objects.create(user=user, model=Change.TAG,
+                                    object_id=2)
+        last = Change.objects.create(user=user, model=Change.TAG,
+                                     object_id=3)
+        Change.objects.filter(id__in=[old.id, last.id]).update(
+            created=timezone.now() - 60 * DAY
+        )
+
+        call_command('prune_changes', stdout=StringIO())
+
+        self.assertEqual(
+            list(Change.objects.order_by('id').values_list('id', flat=True)),
+            [new.id, last.id]
+        )
+
+    def test_parse_import_times(self):
+        """Test parsing the interpreter's import time output"""
+        lines = [
+            'import time: self [us] | cumulative | imported package',
+            'import time:       120 |        120 |   django.utils',
+            'import time:      3000 |       3120 | django',
+            'Traceback (most recent call last):',
+        ]
+
+        self.assertEqual(parse_import_times(lines), [
+            ('django.utils', 120, 120),
+            ('django', 3000, 3120),
+        ])
+
+    @patch('subprocess.run')
+    def test_profile_startup(self, run):
+        """Test reporting cold start import and first request times"""
+        run.return_value = CompletedProcess(
+            args=[], returncode=0,
+            stdout='{"setup": 0.5, "first_request": 0.05, '
+                   '"status": "200 OK"}\n',
+            stderr='import time:      2000 |       2000 | slow\n'
+                   'import time:       100 |        100 | fast\n'
+        )
+        out = StringIO()
+
+        call_command('profile_startup', '--top', '1',
+                     settings='app.api_settings', stdout=out)
+
+        command = run.call_args[0][0]
+        self.assertIn('importtime', command)
+        self.assertEqual(command[-1], '/api/recipe/')
+        self.assertEqual(run.call_args[1]['env']['DJANGO_SETTINGS_MODULE'],
+                         'app.api_settings')
+        report = out.getvalue()
+        self.assertIn('import ms\t2.1', report)
+        self.assertIn('first request ms\t50.0\t200 OK', report)
+        self.assertIn('\tslow', report)
+        self.assertNotIn('\tfast', report)
+
+    @patch('subprocess.run')
+    def test_profile_startup_failure(self, run):
+        """Test that a worker failing to start raises an error"""
+        run.return_value = CompletedProcess(
+            args=[], returncode=1, stdout='',
+            stderr='Traceback (most recent call last):\n'
+                   'ImportError: No module named missing\n'
+        )
+
+        with self.assertRaisesMessage(CommandError, 'ImportError'):
+            call_command('profile_startup', stdout=StringIO())
+
+    @in_memory_storage
+    def test_collect_media(self):
+        """Test that only old, unreferenced images are deleted"""
+        user = get_user_model().objects.create_user('test@bocon.cloud')
+        recipe = Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=5.00
+        )
+        recipe.image.save('kept.jpg', ContentFile(b'kept'))
+        orphan = default_storage.save('uploads/recipe/or/orphan.jpg',
+                                      ContentFile(b'orphan'))
+        legacy = default_storage.save('uploads/recipe/legacy.jpg',
+                                      ContentFile(b'legacy'))
+        recent = default_storage.save('uploads/recipe/re/recent.jpg',
+                                      ContentFile(b'recent'))
+        old = timezone.now() - 2 * DAY
+        for name in (recipe.image.name, orphan, legacy):
+            default_storage.modified[name] = old
+        out = StringIO()
+
+        call_command('collect_media', '--batch-size', '2', stdout=out)
+
+        self.assertTrue(default_storage.exists(recipe.image.name))
+        self.assertTrue(default_storage.exists(recent))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(legacy))
+        self.assertIn('Scanned 4 files. Deleted 2 orphaned files '
+                      '(12 bytes)', out.getvalue())
+
+    @in_memory_storage
+    def test_collect_media_keeps_reused_file(self):
+        """Test that a file reused by an upload mid-run is not deleted"""
+        recipe = Recipe.objects.create(
+            user=get_user_model().objects.create_user('test@bocon.cloud'),
+            title='Soup', time_minutes=5, price=5.00
+        )
+        recipe.image.save('photo.jpg', ContentFile(b'reused'))
+        name = recipe.image.name
+        recipe.image = ''
+        recipe.save()
+        default_storage.modified[name] = timezone.now() - 2 * DAY
+        get_modified_time = default_storage.get_modified_time
+
+        def upload_during_check(checked):
+            modified = get_modified_time(checked)
+            if checked == name and not recipe.image:
+                recipe.image.save('photo.jpg', ContentFile(b'reused'))
+            return modified
+
+        with patch.object(default_storage, 'get_modified_time',
+                          upload_during_check):
+            call_command('collect_media', stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(Recipe.objects.get().image.name, name)
+
+    @in_memory_storage
+    def test_collect_media_dry_run(self):
+        """Test that a dry run reports orphans and missing images only"""
+        user = get_user_model().objects.create_user('test@bocon.cloud')
+        Recipe.objects.create(user=user, title='Soup', time_minutes=5,
+                              price=5.00, image='uploads/recipe/gone.jpg')
+        orphan = default_storage.save('uploads/recipe/or/orphan.jpg',
+                                      ContentFile(b'orphan'))
+        default_storage.modified[orphan] = timezone.now() - 2 * DAY
+        out = StringIO()
+
+        call_command('collect_media', '--dry-run', stdout=out)
+
+        self.assertTrue(default_storage.exists(orphan))
+        self.assertIn('Would delete 1 orphaned files', out.getvalue())
+        self.assertIn('1 recipes reference missing images', out.getvalue())
+
+    @in_memory_storage
+    @override_settings(PROFILE_RETENTION=DAY.total_seconds())
+    def test_collect_media_expired_profiles(self):
+        """Test that request profiles are deleted after the retention"""
+        expired = default_storage.save('profiles/expired.txt',
+                                       ContentFile(b'a;b 1\n'))
+        recent = default_storage.save('profiles/recent.txt',
+                                      ContentFile(b'a;b 1\n'))
+        default_storage.modified[expired] = timezone.now() - 2 * DAY
+        out = StringIO()
+
+        call_command('collect_media', stdout=out)
+
+        self.assertFalse(default_storage.exists(expired))
+        self.assertTrue(default_storage.exists(recent))
+        self.assertIn('Deleted 1 expired profiles', out.getvalue())
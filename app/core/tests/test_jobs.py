@@ -0,0 +1,149 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+
+calls = []
+
+
+@jobs.task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task(name='tests.fail', max_attempts=2)
+def fail():
+    raise ValueError('Broken')
+
+
+@override_settings(JOB_RETRY_DELAY=10, JOB_MAX_RETRY_DELAY=60,
+                   JOB_TIMEOUT=600)
+class JobTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+        jobs.metrics.clear()
+
+    def test_enqueue_and_run(self):
+        """Test that a queued job runs its task with the payload"""
+        job = jobs.enqueue('tests.record', {'value': 1})
+
+        claimed = jobs.claim()
+        outcome = jobs.run(claimed[0])
+
+        job.refresh_from_db()
+        self.assertEqual(outcome, 'succeeded')
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(calls, [1])
+        self.assertEqual(jobs.metrics.summary()[0][:4],
+                         ('tests.record', 1, 0, 0))
+
+    def test_enqueue_idempotency_key(self):
+        """Test that jobs sharing a key are only queued once"""
+        first = jobs.enqueue('tests.record', {'value': 1}, key='once')
+        second = jobs.enqueue('tests.record', {'value': 2}, key='once')
+
+        self.assertEqual(first, second)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_claim_skips_delayed_and_claimed_jobs(self):
+        """Test that only due, queued jobs are claimed"""
+        jobs.enqueue('tests.record', {'value': 1}, delay=60)
+        due = jobs.enqueue('tests.record', {'value': 2})
+
+        self.assertEqual(jobs.claim(5), [due])
+        self.assertEqual(jobs.claim(5), [])
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test that a failing job is retried later, then failed"""
+        job = jobs.enqueue('tests.fail')
+        self.assertEqual(job.max_attempts, 2)
+
+        self.assertEqual(jobs.run(jobs.claim()[0]), 'retried')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('ValueError: Broken', job.last_error)
+        self.assertGreater(job.run_at,
+                           timezone.now() + timedelta(seconds=9))
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(jobs.run(jobs.claim()[0]), 'failed')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_backoff_doubles_up_to_limit(self):
+        """Test the retry delay doubles per attempt up to the maximum"""
+        self.assertEqual(
+            [jobs.backoff(attempt) for attempt in range(1, 5)],
+            [10, 20, 40, 60]
+        )
+
+    def test_unknown_task_fails(self):
+        """Test that a job for an unregistered task is not run"""
+        jobs.enqueue('tests.missing')
+
+        self.assertEqual(jobs.run(jobs.claim()[0]), 'retried')
+        self.assertIn('No task named tests.missing',
+                      Job.objects.get().last_error)
+
+    def test_heartbeat_keeps_running_jobs_locked(self):
+        """Test that jobs still waiting or running are not requeued"""
+        jobs.enqueue('tests.record', {'value': 1})
+        jobs.enqueue('tests.record', {'value': 2})
+        first, second = jobs.claim(2)
+        heartbeat = jobs.Heartbeat([first, second], interval=60)
+        jobs.run(first)
+        heartbeat.finish(first)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        heartbeat.beat()
+
+        self.assertEqual(jobs.requeue_lost(), 0)
+        first.refresh_from_db()
+        self.assertEqual(first.status, Job.DONE)
+        second.refresh_from_db()
+        self.assertEqual(second.status, Job.RUNNING)
+
+    def test_requeue_lost(self):
+        """Test that jobs left running by a dead worker are requeued"""
+        jobs.enqueue('tests.record', {'value': 1})
+        jobs.claim()
+        self.assertEqual(jobs.requeue_lost(), 0)
+
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_lost(), 1)
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+
+    @patch('core.management.commands.run_jobs.autodiscover_modules')
+    def test_run_jobs_burst(self, autodiscover):
+        """Test the worker command runs due jobs and exits when idle"""
+        for value in range(3):
+            jobs.enqueue('tests.record', {'value': value})
+        out = StringIO()
+
+        call_command('run_jobs', '--burst', '--batch', '2', stdout=out)
+
+        autodiscover.assert_called_once_with('tasks')
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+        self.assertIn('tests.record\t3 succeeded', out.getvalue())
+
+    def test_run_jobs_stats(self):
+        """Test printing the number of jobs per task and status"""
+        jobs.enqueue('tests.record', {'value': 1})
+        jobs.enqueue('tests.record', {'value': 2})
+        out = StringIO()
+
+        call_command('run_jobs', '--stats', stdout=out)
+
+        self.assertIn('tests.record\tqueued\t2', out.getvalue())
@@ -0,0 +1,154 @@
+import multiprocessing
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+
+METRICS_URL = reverse('metrics')
+RECIPE_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+def make_registry():
+    registry = metrics.Registry()
+    counter = registry.counter('jobs_total', 'Jobs run', ['queue'])
+    histogram = registry.histogram('job_seconds', 'Job run time',
+                                   buckets=(0.1, 1))
+    return registry, counter, histogram
+
+
+def count_in_child(counter, amount):
+    counter.inc(amount, queue='mail')
+    counter.registry.flush()
+
+
+@override_settings(METRICS_DIR=None)
+class RegistryTests(SimpleTestCase):
+
+    def test_exposition(self):
+        """Test that counters and histograms render in text format"""
+        registry, counter, histogram = make_registry()
+        counter.inc(queue='mail')
+        counter.inc(2, queue='mail')
+        counter.inc(queue='say "hi"')
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+
+        self.assertEqual(registry.exposition(), '\n'.join([
+            '# HELP jobs_total Jobs run',
+            '# TYPE jobs_total counter',
+            'jobs_total{queue="mail"} 3',
+            'jobs_total{queue="say \\"hi\\""} 1',
+            '# HELP job_seconds Job run time',
+            '# TYPE job_seconds histogram',
+            'job_seconds_bucket{le="0.1"} 1',
+            'job_seconds_bucket{le="1.0"} 2',
+            'job_seconds_bucket{le="+Inf"} 2',
+            'job_seconds_count 2',
+            'job_seconds_sum 0.55',
+        ]) + '\n')
+
+    def test_labels_required(self):
+        """Test that every label of a metric must be given"""
+        registry, counter, _ = make_registry()
+
+        with self.assertRaises(ValueError):
+            counter.inc(worker='1')
+
+    def test_processes_aggregated(self):
+        """Test that totals written by each process are added up"""
+        registry, counter, _ = make_registry()
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            counter.inc(queue='mail')
+            context = multiprocessing.get_context('fork')
+            for amount in (2, 3):
+                child = context.Process(target=count_in_child,
+                                        args=(counter, amount))
+                child.start()
+                child.join()
+
+            exposition = registry.exposition()
+
+        self.assertIn('jobs_total{queue="mail"} 6\n', exposition)
+
+
+class MetricsMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@bocon.cloud',
+            'testPass'
+        )
+        cls.recipe = Recipe.objects.create(user=cls.user, title='Toast',
+                                           time_minutes=5, price=2)
+
+    def setUp(self):
+        metrics.registry.clear()
+        self.client = APIClient()
+
+    def scrape(self):
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        return res.content.decode()
+
+    def test_requests_counted_per_action(self):
+        """Test that requests, latency and queries are recorded per action"""
+        self.client.force_authenticate(self.user)
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        exposition = self.scrape()
+
+        self.assertIn('http_requests_total{view="RecipeViewSet",'
+                      'action="list",method="GET",status="200"} 2\n',
+                      exposition)
+        self.assertIn('http_request_duration_seconds_count'
+                      '{view="RecipeViewSet",action="list"} 2\n', exposition)
+        self.assertIn('db_queries_total{view="RecipeViewSet",action="list"}',
+                      exposition)
+
+    def test_upload_bytes_counted(self):
+        """Test that uploaded file sizes are counted"""
+        self.client.force_authenticate(self.user)
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        self.client.post(url, {
+            'image': SimpleUploadedFile('image.jpg', b'x' * 1234)
+        }, format='multipart')
+
+        self.assertIn('upload_bytes_total{view="RecipeViewSet",'
+                      'action="upload_image"} 1234\n', self.scrape())
+
+    def test_token_auth_outcomes(self):
+        """Test that token authentication outcomes are counted"""
+        token = self.client.post(TOKEN_URL, {
+            'email': 'test@bocon.cloud',
+            'password': 'testPass'
+        }).data['token']
+        for credentials in (token, token, 'bogus'):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {credentials}')
+            self.client.get(ME_URL)
+        self.client.credentials()
+
+        exposition = self.scrape()
+        self.assertIn('token_auth_total{outcome="success"} 2\n', exposition)
+        self.assertIn('token_auth_total{outcome="invalid"} 1\n', exposition)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_scrape_token(self):
+        """Test that a configured scrape token is required"""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
@@ -0,0 +1,47 @@
+import gzip
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.middleware import CompressionMiddleware, negotiate_encoding, \
+                            parse_accept_encoding
+
+
+def compress(content, accept_encoding):
+    """Run content through the middleware for the given header"""
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    middleware = CompressionMiddleware(lambda req: HttpResponse(content))
+    return middleware(request)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTests(TestCase):
+
+    def test_parse_accept_encoding(self):
+        """Test that q-values are parsed for each coding"""
+        codings = parse_accept_encoding('gzip;q=0.5, br, zstd;q=0')
+
+        self.assertEqual(codings, {'gzip': 0.5, 'br': 1.0, 'zstd': 0.0})
+
+    def test_negotiate_respects_quality(self):
+        """Test that refused codings are never selected"""
+        self.assertEqual(negotiate_encoding('gzip')[0], 'gzip')
+        self.assertIsNone(negotiate_encoding('gzip;q=0'))
+        self.assertIsNone(negotiate_encoding(''))
+
+    def test_gzip_response(self):
+        """Test that large responses are gzipped when accepted"""
+        content = b'recipe' * 100
+
+        res = compress(content, 'gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), content)
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_small_response_not_compressed(self):
+        """Test that responses below the threshold are sent as is"""
+        res = compress(b'recipe', 'gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'recipe')
@@ -0,0 +1,54 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeDuplicateNamesMigrationTests(TransactionTestCase):
+    """Test merging duplicate tags and ingredients in migration 0008"""
+    migrate_from = [('core', '0007_change')]
+    migrate_to = [('core', '0008_merge_duplicate_names')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.latest = MigrationExecutor(connection).loader.graph.leaf_nodes()
+        self.addCleanup(self.migrate, self.latest)
+        apps = self.migrate(self.migrate_from)
+
+        User = apps.get_model('core', 'User')
+        Tag = apps.get_model('core', 'Tag')
+        Recipe = apps.get_model('core', 'Recipe')
+        user = User.objects.create(email='test@bocon.cloud')
+        self.tag_ids = [Tag.objects.create(user=user, name='Vegan').id
+                        for _ in range(3)]
+        self.other_tag = Tag.objects.create(user=user, name='Dessert').id
+        both = Recipe.objects.create(user=user, title='Both',
+                                     time_minutes=5, price=5)
+        both.tags.set(self.tag_ids[1:] + [self.other_tag])
+        kept = Recipe.objects.create(user=user, title='Kept',
+                                     time_minutes=5, price=5)
+        kept.tags.set(self.tag_ids)
+        self.recipe_ids = [both.id, kept.id]
+
+    def test_recipe_linking_several_duplicates(self):
+        """Test that a recipe linking two duplicates keeps one link"""
+        apps = self.migrate(self.migrate_to)
+
+        Tag = apps.get_model('core', 'Tag')
+        Recipe = apps.get_model('core', 'Recipe')
+        self.assertEqual(
+            sorted(Tag.objects.values_list('id', flat=True)),
+            [self.tag_ids[0], self.other_tag]
+        )
+        for recipe_id in self.recipe_ids:
+            self.assertEqual(
+                sorted(Recipe.objects.get(id=recipe_id).tags.values_list(
+                    'id', flat=True
+                )),
+                [self.tag_ids[0], self.other_tag]
+                if recipe_id == self.recipe_ids[0] else [self.tag_ids[0]]
+            )
@@ -1,7 +1,9 @@
-from unittest.mock import patch
+import hashlib
 
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from core import models
 
@@ -82,14 +84,57 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(recipe), recipe.title)
 
-    @patch('uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
-        """Test that image is saved in the correct location"""
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
+    def test_recipe_file_name_hash(self):
+        """Test that image is saved in a directory per hash prefix"""
+        file_path = models.recipe_image_file_path(None, 'ab12cd.jpg')
 
-        file_path = models.recipe_image_file_path(None, 'myimage.jpg')
-
-        exp_path = f'uploads/recipe/{uuid}.jpg'
+        exp_path = 'uploads/recipe/ab/ab12cd.jpg'
 
         self.assertEqual(file_path, exp_path)
+
+    def test_recipe_image_deduplicated(self):
+        """Test that identical images are stored once and shared"""
+        user = sample_user()
+        recipes = [
+            models.Recipe.objects.create(
+                user=user, title=title, time_minutes=5, price=5.00
+            )
+            for title in ('First', 'Second')
+        ]
+        for recipe in recipes:
+            recipe.image.save('Photo.JPG', ContentFile(b'same bytes'))
+
+        digest = hashlib.sha256(b'same bytes').hexdigest()
+        name = f'uploads/recipe/{digest[:2]}/{digest}.jpg'
+        storage = recipes[0].image.storage
+        self.assertEqual([r.image.name for r in recipes], [name, name])
+        self.assertEqual(recipes[0].image.references(), 1)
+
+        recipes[0].image.delete()
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(
+            models.Recipe.objects.get(pk=recipes[0].pk).image.name, ''
+        )
+
+        recipes[1].image.delete()
+        self.assertFalse(storage.exists(name))
+
+    @override_settings(
+        DEFAULT_FILE_STORAGE='core.tests.storage.InMemoryStorage'
+    )
+    def test_recipe_image_reuse_touches_file(self):
+        """Test that reusing a stored image refreshes its modified time"""
+        recipe = models.Recipe.objects.create(
+            user=sample_user(), title='Soup', time_minutes=5, price=5.00
+        )
+        recipe.image.save('photo.jpg', ContentFile(b'bytes'))
+        storage = recipe.image.storage
+        old = timezone.now() - timezone.timedelta(days=2)
+        storage.modified[recipe.image.name] = old
+
+        other = models.Recipe.objects.create(
+            user=recipe.user, title='Stew', time_minutes=5, price=5.00
+        )
+        other.image.save('photo.jpg', ContentFile(b'bytes'))
+
+        self.assertGreater(storage.get_modified_time(other.image.name), old)
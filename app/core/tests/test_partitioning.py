@@ -0,0 +1,97 @@
+import re
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def scanned_partitions(queryset):
+    """Return the names of the partitions a query plan reads"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN {sql}', params)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+    return set(re.findall(r'core_recipe\w*_p\d+', plan))
+
+
+def partitioning_supported():
+    """Return whether the test database supports declarative partitions"""
+    return connection.vendor == 'postgresql' and \
+        connection.pg_version >= 110000
+
+
+class PartitionTablesTests(TestCase):
+
+    def setUp(self):
+        if not partitioning_supported():
+            self.skipTest('Requires PostgreSQL 11 or later')
+        call_command('partition_tables', '--partitions', '4',
+                     stdout=StringIO())
+        self.user = get_user_model().objects.create_user(
+            'test@bocon.cloud',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_api_on_partitioned_tables(self):
+        """Test that recipes are created and listed once partitioned"""
+        res = self.client.post(RECIPE_URL, {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '7.00',
+            'tags': ['Vegan', 'Spicy'],
+            'ingredients': ['Rice'],
+        }, format='json')
+        self.assertEqual(res.status_code, 201)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data[0]['title'], 'Curry')
+        self.assertEqual(len(res.data[0]['tags']), 2)
+
+    def test_partition_pruning(self):
+        """Test that queries scoped to a user read a single partition"""
+        recipe = Recipe.objects.create(user=self.user, title='Soup',
+                                       time_minutes=5, price=5)
+        through = Recipe.tags.through
+
+        self.assertEqual(len(scanned_partitions(
+            Recipe.objects.filter(user=self.user)
+        )), 1)
+        self.assertEqual(len(scanned_partitions(
+            Recipe.objects.all()
+        )), 4)
+        self.assertEqual(len(scanned_partitions(
+            through.objects.filter(recipe_id=recipe.pk)
+        )), 1)
+
+    def test_already_partitioned(self):
+        """Test that running the command again changes nothing"""
+        out = StringIO()
+
+        call_command('partition_tables', stdout=out)
+
+        self.assertIn('already partitioned', out.getvalue())
+
+
+class PartitionTablesUnsupportedTests(TestCase):
+
+    def setUp(self):
+        if partitioning_supported():
+            self.skipTest('Partitioning is supported')
+
+    def test_requires_postgres(self):
+        """Test that other databases and PostgreSQL 10 are refused"""
+        with self.assertRaises(CommandError):
+            call_command('partition_tables', stdout=StringIO())
@@ -0,0 +1,145 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import profiling
+from core.models import Recipe
+from core.tests.storage import InMemoryStorage
+from recipe.serializers import RecipeSerializer
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+to_representation = RecipeSerializer.to_representation
+
+
+def slow_to_representation(self, instance):
+    time.sleep(0.05)
+    return to_representation(self, instance)
+
+
+def parse_server_timing(header):
+    """Return a dict of metric durations in a Server-Timing header"""
+    metrics = {}
+    for metric in header.split(','):
+        name, _, duration = metric.strip().partition(';dur=')
+        metrics[name] = float(duration)
+    return metrics
+
+
+@patch.object(RecipeSerializer, 'to_representation', slow_to_representation)
+class ProfilingMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_superuser(
+            'staff@bocon.cloud',
+            'testPass'
+        )
+        cls.user = get_user_model().objects.create_user(
+            'test@bocon.cloud',
+            'testPass'
+        )
+        Recipe.objects.create(user=cls.staff, title='Toast',
+                              time_minutes=5, price=2)
+        Recipe.objects.create(user=cls.user, title='Toast',
+                              time_minutes=5, price=2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.storage = InMemoryStorage()
+        patcher = patch.object(profiling, 'default_storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def authenticate(self, user):
+        """Send the access token the token endpoint issues for user"""
+        res = self.client.post(TOKEN_URL, {'email': user.email,
+                                           'password': 'testPass'})
+        token = res.data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_staff_request_profiled(self):
+        """Test that staff get a time breakdown and downloadable stacks"""
+        self.authenticate(self.staff)
+        res = self.client.get(RECIPE_URL, {'profile': 1})
+
+        timing = parse_server_timing(res['Server-Timing'])
+        self.assertGreater(timing['serializer'], 25)
+        self.assertGreaterEqual(timing['total'], timing['serializer'])
+        name, = self.storage.files
+        self.assertTrue(res['X-Profile-URL'].endswith(name))
+        stacks = self.storage.files[name].decode()
+        self.assertIn('test_profiling:slow_to_representation', stacks)
+        self.assertIn('recipe.views:list', stacks)
+
+    def test_user_token_not_profiled(self):
+        """Test that the sampler never starts for a non-staff token"""
+        self.authenticate(self.user)
+
+        with patch.object(profiling.Sampler, 'start') as start:
+            res = self.client.get(RECIPE_URL, {'profile': 1})
+
+        start.assert_not_called()
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Profile-URL', res)
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(self.storage.files, {})
+
+    def test_profile_header(self):
+        """Test that profiling can be requested with a header"""
+        self.authenticate(self.staff)
+        res = self.client.get(RECIPE_URL, HTTP_X_PROFILE='1')
+
+        self.assertIn('X-Profile-URL', res)
+
+    def test_anonymous_not_profiled(self):
+        """Test that the sampler never starts for unauthenticated clients"""
+        with patch.object(profiling.Sampler, 'start') as start:
+            res = self.client.get(RECIPE_URL, HTTP_X_PROFILE='1',
+                                  HTTP_AUTHORIZATION='Token invalid')
+
+        start.assert_not_called()
+        self.assertEqual(res.status_code, 401)
+        self.assertNotIn('X-Profile-URL', res)
+
+    def test_not_requested(self):
+        """Test that requests are not profiled unless asked"""
+        self.authenticate(self.staff)
+        with patch.object(profiling, 'profile') as profile:
+            res = self.client.get(RECIPE_URL)
+
+        profile.assert_not_called()
+        self.assertNotIn('X-Profile-URL', res)
+
+
+class SamplerTests(TestCase):
+
+    def test_categories(self):
+        """Test that the innermost matching frame decides the category"""
+        self.assertEqual(profiling.categorize('django.db.models.query'),
+                         'orm')
+        self.assertEqual(profiling.categorize('recipe.serializers'),
+                         'serializer')
+        self.assertEqual(profiling.categorize('rest_framework.renderers'),
+                         'rendering')
+        self.assertEqual(profiling.categorize('user.authentication'), 'auth')
+        self.assertIsNone(profiling.categorize('recipe.views'))
+
+    def test_collapsed_stacks(self):
+        """Test that stacks are written in collapsed flamegraph format"""
+        result, profile = profiling.profile(lambda: time.sleep(0.02) or 1)
+
+        self.assertEqual(result, 1)
+        lines = profile.collapsed().splitlines()
+        self.assertTrue(lines)
+        stack, weight = lines[0].rsplit(' ', 1)
+        self.assertTrue(stack.startswith('core.tests.test_profiling:'))
+        self.assertGreater(sum(int(line.rsplit(' ', 1)[1])
+                               for line in lines), 10000)
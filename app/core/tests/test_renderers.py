@@ -0,0 +1,42 @@
+import json
+from decimal import Decimal
+from unittest import skipIf
+
+from django.test import TestCase
+
+from core.renderers import CompactJSONRenderer, MessagePackRenderer, \
+                           msgpack, to_columns
+
+
+class RendererTests(TestCase):
+
+    def test_to_columns(self):
+        """Test that lists of same-shaped objects become columns and rows"""
+        data = {'data': [{'id': 1, 'tags': [1]}, {'id': 2, 'tags': []}]}
+
+        self.assertEqual(to_columns(data), {
+            'data': {'columns': ['id', 'tags'], 'rows': [[1, [1]], [2, []]]}
+        })
+
+    def test_to_columns_mixed_shapes(self):
+        """Test that lists of differently shaped objects are left as is"""
+        data = [{'id': 1}, {'name': 'Vegan'}]
+
+        self.assertEqual(to_columns(data), data)
+
+    def test_compact_json_renderer(self):
+        """Test that compact JSON renders valid columnar JSON"""
+        content = CompactJSONRenderer().render([{'id': 1}, {'id': 2}])
+
+        self.assertEqual(json.loads(content.decode()),
+                         {'columns': ['id'], 'rows': [[1], [2]]})
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_messagepack_renderer(self):
+        """Test that MessagePack output round trips"""
+        content = MessagePackRenderer().render(
+            [{'id': 1, 'price': Decimal('5.50')}]
+        )
+
+        self.assertEqual(msgpack.unpackb(content, raw=False),
+                         [{'id': 1, 'price': 5.5}])
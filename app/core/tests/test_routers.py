@@ -0,0 +1,98 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, OperationalError
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Tag
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@skipUnless('replica' in settings.DATABASES,
+            'Needs the replica alias of app.test_settings')
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # Data is committed so the replica connection can read it
+
+    def setUp(self):
+        cache.clear()
+        routers.ReplicaRouter.down_until.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@bocon.cloud',
+            'testpass'
+        )
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get_tags(self):
+        """GET the tag list, returning (response, replica, primary) SQL"""
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            res = self.client.get(TAGS_URL)
+        return res, [q['sql'] for q in replica], [q['sql'] for q in primary]
+
+    def test_safe_request_reads_replica(self):
+        """Test that GET requests read from the replica"""
+        res, replica, primary = self._get_tags()
+
+        self.assertEqual(res.data[0]['name'], 'Vegan')
+        self.assertTrue(any('core_tag' in sql for sql in replica))
+        self.assertFalse(primary)
+        self.assertNotIn(routers.PIN_COOKIE, res.cookies)
+
+    def test_write_pins_user_to_primary(self):
+        """Test that a user reads their own writes after writing"""
+        res = self.client.post(TAGS_URL, {'name': 'Vegetarian'})
+
+        self.assertIn(routers.PIN_COOKIE, res.cookies)
+        self.assertTrue(cache.get(routers.pin_key(self.user.pk)))
+
+        # Another client of the same user, without the cookie
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        res, replica, primary = self._get_tags()
+
+        self.assertEqual(len(res.data), 2)
+        self.assertFalse(replica)
+        self.assertTrue(any('core_tag' in sql for sql in primary))
+
+    def test_pin_cookie_reads_primary(self):
+        """Test that a client with the pin cookie reads from the primary"""
+        self.client.cookies[routers.PIN_COOKIE] = '1'
+
+        res, replica, primary = self._get_tags()
+
+        self.assertFalse(replica)
+        self.assertTrue(primary)
+
+    def test_replica_down_fails_over_to_primary(self):
+        """Test that an unreachable replica is skipped for a while"""
+        replica = connections['replica']
+        with patch.object(replica, 'ensure_connection',
+                          side_effect=OperationalError) as ensure, \
+                CaptureQueriesContext(connections['default']) as primary:
+            res = self.client.get(TAGS_URL)
+            self.assertEqual(res.data[0]['name'], 'Vegan')
+            self.assertTrue(primary)
+
+            self.client.get(TAGS_URL)
+            self.assertEqual(ensure.call_count, 1)
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test that commands and jobs always read from the primary"""
+        router = routers.ReplicaRouter()
+
+        self.assertEqual(router.db_for_read(Tag), 'default')
+        self.assertTrue(router.allow_migrate('default', 'core'))
+        self.assertFalse(router.allow_migrate('replica', 'core'))
@@ -0,0 +1,123 @@
+import io
+import json
+import logging
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import slowlog
+from core.models import Recipe
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def make_record(**extra):
+    record = logging.LogRecord('core.slowlog.query', logging.WARNING,
+                               __file__, 1, 'slow %s', ('query',), None)
+    record.__dict__.update(extra)
+    return record
+
+
+class SlowLogHandlerTests(TestCase):
+
+    def test_json_formatter(self):
+        """Test that records are formatted as JSON with extra fields"""
+        line = slowlog.JSONFormatter().format(
+            make_record(sql='SELECT 1', database='default', duration_ms=2.5)
+        )
+
+        entry = json.loads(line)
+        self.assertEqual(entry['message'], 'slow query')
+        self.assertEqual(entry['level'], 'WARNING')
+        self.assertEqual(entry['sql'], 'SELECT 1')
+        self.assertEqual(entry['database'], 'default')
+        self.assertEqual(entry['duration_ms'], 2.5)
+        self.assertNotIn('lineno', entry)
+
+    def test_background_handler_writes_json_lines(self):
+        """Test that the handler writes records from its own thread"""
+        stream = io.StringIO()
+        handler = slowlog.BackgroundHandler(stream)
+        handler.handle(make_record(sql='SELECT 1'))
+        handler.handle(make_record(sql='SELECT 2'))
+        handler.close()
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual([json.loads(line)['sql'] for line in lines],
+                         ['SELECT 1', 'SELECT 2'])
+
+    def test_background_handler_drops_when_full(self):
+        """Test that a full queue drops records instead of blocking"""
+        handler = slowlog.BackgroundHandler(io.StringIO(), maxsize=1)
+        with patch.object(handler, '_ensure_listener'):
+            handler.handle(make_record())
+            handler.handle(make_record())
+
+        self.assertEqual(handler.dropped, 1)
+
+
+class SlowLogMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass'
+        )
+        Recipe.objects.create(user=cls.user, title='Toast', time_minutes=5,
+                              price=2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_EXPLAIN_RATE=1)
+    def test_slow_query_logged_with_context(self):
+        """Test that slow queries carry their plan and request context"""
+        with self.assertLogs('core.slowlog.query', 'WARNING') as logs:
+            self.client.get(RECIPE_URL, {'max_time': 20})
+
+        record = next(record for record in logs.records
+                      if 'FROM "core_recipe"' in record.sql)
+        self.assertEqual(record.view, 'RecipeViewSet')
+        self.assertEqual(record.action, 'list')
+        self.assertEqual(record.user_id, self.user.id)
+        self.assertEqual(record.query_params, {'max_time': ['20']})
+        self.assertNotIn('params', vars(record))
+        self.assertTrue(record.plan)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_explain_off_by_default(self):
+        """Test that no plan is taken unless enabled"""
+        with self.assertLogs('core.slowlog.query', 'WARNING') as logs, \
+                patch.object(slowlog, 'explain') as explain:
+            self.client.get(RECIPE_URL)
+
+        explain.assert_not_called()
+        self.assertTrue(all(record.plan is None for record in logs.records))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request_logged(self):
+        """Test that slow requests are logged with their query totals"""
+        with self.assertLogs('core.slowlog.request', 'WARNING') as logs:
+            self.client.get(RECIPE_URL)
+
+        record, = logs.records
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.view, 'RecipeViewSet')
+        self.assertGreater(record.queries, 0)
+        self.assertGreaterEqual(record.duration_ms, record.query_time_ms)
+
+    def test_fast_requests_not_logged(self):
+        """Test that nothing is logged under the thresholds"""
+        with patch.object(slowlog.query_logger, 'warning') as query, \
+                patch.object(slowlog.request_logger, 'warning') as request:
+            self.client.get(RECIPE_URL)
+
+        query.assert_not_called()
+        request.assert_not_called()
@@ -0,0 +1,205 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+from urllib.parse import urlsplit, parse_qs
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, SimpleTestCase, override_settings
+
+from core.models import Recipe
+from core.storage import ObjectStorage, S3Client, touch
+from core.tests.storage import LocalObjectStore
+
+
+DAY = timedelta(days=1)
+
+
+class SlowObjectStore(LocalObjectStore):
+    """Object store whose part uploads take a while, to observe overlap"""
+
+    def __init__(self, fail_part=None, **options):
+        super().__init__(**options)
+        self.fail_part = fail_part
+        self.active = 0
+        self.max_active = 0
+        self.counter_lock = threading.Lock()
+
+    def upload_part(self, key, upload_id, number, body):
+        with self.counter_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.02)
+            if number == self.fail_part:
+                raise IOError('Connection reset')
+            return super().upload_part(key, upload_id, number, body)
+        finally:
+            with self.counter_lock:
+                self.active -= 1
+
+
+@override_settings(OBJECT_STORAGE_MULTIPART_THRESHOLD=16,
+                   OBJECT_STORAGE_PART_SIZE=4,
+                   OBJECT_STORAGE_CONCURRENCY=3,
+                   OBJECT_STORAGE_URL_EXPIRY=60)
+class ObjectStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        self.client = SlowObjectStore()
+        self.storage = ObjectStorage(client=self.client)
+
+    def test_small_file_single_request(self):
+        """Test that small files are sent whole, without multipart"""
+        with patch.object(self.client, 'create_multipart_upload') as create:
+            name = self.storage.save('uploads/a.jpg', ContentFile(b'small'))
+
+        create.assert_not_called()
+        self.assertEqual(name, 'uploads/a.jpg')
+        self.assertEqual(self.storage.open(name).read(), b'small')
+        self.assertEqual(self.storage.size(name), 5)
+
+    def test_large_file_parallel_multipart(self):
+        """Test that large files are sent as parallel parts in order"""
+        content = bytes(range(50))
+
+        name = self.storage.save('uploads/big.jpg', ContentFile(content))
+
+        self.assertEqual(self.storage.open(name).read(), content)
+        self.assertGreater(self.client.max_active, 1)
+        self.assertLessEqual(self.client.max_active, 3)
+        self.assertEqual(self.client.uploads, {})
+
+    def test_failed_multipart_aborted(self):
+        """Test that a failed part aborts the upload"""
+        self.client.fail_part = 2
+
+        with self.assertRaises(IOError):
+            self.storage.save('uploads/big.jpg', ContentFile(b'x' * 50))
+
+        self.assertFalse(self.storage.exists('uploads/big.jpg'))
+        self.assertEqual(self.client.uploads, {})
+
+    def test_presigned_url(self):
+        """Test that URLs are signed for the object and expire"""
+        self.storage.save('uploads/a.jpg', ContentFile(b'small'))
+
+        url = urlsplit(self.storage.url('uploads/a.jpg'))
+        query = {key: value[0] for key, value in parse_qs(url.query).items()}
+
+        self.assertEqual(url.path, '/media/uploads/a.jpg')
+        self.assertTrue(self.client.verify('uploads/a.jpg', **query))
+        self.assertFalse(self.client.verify('uploads/b.jpg', **query))
+        with patch('time.time', return_value=time.time() + 120):
+            self.assertFalse(self.client.verify('uploads/a.jpg', **query))
+
+    def test_listdir_and_delete(self):
+        """Test listing prefixes as directories and deleting objects"""
+        for name in ('uploads/ab/1.jpg', 'uploads/cd/2.jpg', 'uploads/3.jpg'):
+            self.storage.save(name, ContentFile(b'data'))
+
+        self.assertEqual(self.storage.listdir('uploads'),
+                         (['ab', 'cd'], ['3.jpg']))
+
+        self.storage.delete('uploads/3.jpg')
+        self.assertFalse(self.storage.exists('uploads/3.jpg'))
+
+    def test_touch(self):
+        """Test that touching an object refreshes its modified time"""
+        self.storage.save('uploads/a.jpg', ContentFile(b'small'))
+        body, modified = self.client.objects['uploads/a.jpg']
+        self.client.objects['uploads/a.jpg'] = (body, modified - DAY)
+
+        touch(self.storage, 'uploads/a.jpg')
+
+        self.assertGreaterEqual(
+            self.storage.get_modified_time('uploads/a.jpg'), modified
+        )
+        self.assertEqual(self.storage.open('uploads/a.jpg').read(), b'small')
+
+    def test_touch_local_file(self):
+        """Test that touching a local file sets its mtime"""
+        with tempfile.TemporaryDirectory() as directory:
+            storage = FileSystemStorage(location=directory)
+            name = storage.save('a.jpg', ContentFile(b'small'))
+            os.utime(storage.path(name), (0, 0))
+
+            touch(storage, name)
+
+            self.assertGreater(os.path.getmtime(storage.path(name)), 0)
+
+
+class S3ClientError(Exception):
+    """Stand-in for botocore's ClientError"""
+
+    def __init__(self, code):
+        self.response = {'Error': {'Code': code}}
+
+
+@patch('core.storage.ClientError', S3ClientError, create=True)
+@patch('core.storage.boto3')
+class S3ClientTests(SimpleTestCase):
+
+    def test_boto3_required(self, boto3):
+        """Test that a missing boto3 is reported as a configuration error"""
+        with patch('core.storage.boto3', None):
+            with self.assertRaises(ImproperlyConfigured):
+                S3Client('media')
+
+    def test_put_object_content_type(self, boto3):
+        """Test that objects are stored with their content type"""
+        S3Client('media').put_object('uploads/a.jpg', b'small')
+
+        boto3.client.return_value.put_object.assert_called_once_with(
+            Bucket='media', Key='uploads/a.jpg', Body=b'small',
+            ContentType='image/jpeg'
+        )
+
+    def test_head_missing_object(self, boto3):
+        """Test that a missing object has no head"""
+        s3 = boto3.client.return_value
+        s3.head_object.side_effect = S3ClientError('404')
+
+        self.assertIsNone(S3Client('media').head_object('uploads/a.jpg'))
+
+    def test_touch_keeps_content_type(self, boto3):
+        """Test that touching an object keeps its content type"""
+        s3 = boto3.client.return_value
+        s3.head_object.return_value = {'ContentType': 'image/png',
+                                       'Metadata': {'owner': '1'}}
+
+        S3Client('media').touch('uploads/a.jpg')
+
+        s3.copy_object.assert_called_once_with(
+            Bucket='media', Key='uploads/a.jpg',
+            CopySource={'Bucket': 'media', 'Key': 'uploads/a.jpg'},
+            MetadataDirective='REPLACE', ContentType='image/png',
+            Metadata={'owner': '1'}
+        )
+
+
+class RecipeObjectStorageTests(TestCase):
+
+    def test_recipe_image_in_object_store(self):
+        """Test recipe images are stored once in the object store"""
+        storage = ObjectStorage(client=LocalObjectStore())
+        user = get_user_model().objects.create_user('test@bocon.cloud')
+
+        with patch.object(Recipe._meta.get_field('image'), 'storage',
+                          storage):
+            recipes = [
+                Recipe.objects.create(user=user, title=title,
+                                      time_minutes=5, price=5.00)
+                for title in ('First', 'Second')
+            ]
+            for recipe in recipes:
+                recipe.image.save('photo.jpg', ContentFile(b'photo'))
+
+        self.assertEqual(recipes[0].image.name, recipes[1].image.name)
+        self.assertEqual(list(storage.client.objects),
+                         [recipes[0].image.name])
@@ -0,0 +1,131 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.throttling import BACKENDS, LocalTokenBucket, CacheWindowCounter
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+REST_FRAMEWORK = dict(
+    settings.REST_FRAMEWORK,
+    DEFAULT_THROTTLE_CLASSES=['core.throttling.ScopedRateThrottle'],
+    DEFAULT_THROTTLE_RATES={
+        'read': '2/min',
+        'write': '100/min',
+        'token': '1/hour',
+    },
+)
+
+
+class TokenBucketTests(TestCase):
+
+    def test_bucket_allows_burst_then_waits(self):
+        """Test that a bucket admits its capacity then asks to wait"""
+        bucket = LocalTokenBucket()
+
+        self.assertIsNone(bucket.consume('key', 3, 60))
+        self.assertIsNone(bucket.consume('key', 3, 60))
+        self.assertIsNone(bucket.consume('key', 3, 60))
+        wait = bucket.consume('key', 3, 60)
+
+        self.assertGreater(wait, 19)
+        self.assertLessEqual(wait, 20)
+
+    def test_bucket_overhead(self):
+        """Test that consuming a token costs well under a millisecond"""
+        bucket = LocalTokenBucket()
+        start = time.perf_counter()
+        for i in range(10000):
+            bucket.consume(f'user:{i % 100}', 1000, 60)
+        elapsed = (time.perf_counter() - start) / 10000
+
+        self.assertLess(elapsed, 0.001)
+
+    def test_bucket_evicts_least_recently_used(self):
+        """Test that the oldest bucket is dropped once over the limit"""
+        bucket = LocalTokenBucket()
+        bucket.max_buckets = 2
+
+        bucket.consume('first', 1, 60)
+        bucket.consume('second', 1, 60)
+        bucket.consume('first', 1, 60)
+        bucket.consume('third', 1, 60)
+
+        self.assertEqual(list(bucket.buckets), ['first', 'third'])
+
+    def test_cache_window_counter(self):
+        """Test that the shared counter enforces the limit"""
+        counter = CacheWindowCounter()
+
+        self.assertIsNone(counter.consume('test-key', 1, 3600))
+        self.assertGreater(counter.consume('test-key', 1, 3600), 0)
+
+
+@override_settings(REST_FRAMEWORK=REST_FRAMEWORK)
+class ScopedRateThrottleTests(TestCase):
+
+    def setUp(self):
+        BACKENDS['local'].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass'
+        )
+
+    def tearDown(self):
+        BACKENDS['local'].clear()
+
+    def test_read_throttled_with_retry_after(self):
+        """Test that reads over the rate get 429 with Retry-After"""
+        self.client.force_authenticate(self.user)
+
+        for i in range(2):
+            res = self.client.get(RECIPE_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(res['Retry-After']), 0)
+
+    def test_rates_are_per_user(self):
+        """Test that one user's traffic does not throttle another"""
+        other = get_user_model().objects.create_user(
+            email='other@bocon.cloud',
+            password='testPass'
+        )
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            self.client.get(RECIPE_URL)
+
+        self.client.force_authenticate(other)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_token_scope(self):
+        """Test that token issue uses its own rate"""
+        payload = {'email': 'test@bocon.cloud', 'password': 'testPass'}
+
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_forwarded_for_not_trusted(self):
+        """Test that anonymous clients can't pose as others by header"""
+        payload = {'email': 'test@bocon.cloud', 'password': 'testPass'}
+
+        self.client.post(TOKEN_URL, payload, HTTP_X_FORWARDED_FOR='1.1.1.1')
+        res = self.client.post(TOKEN_URL, payload,
+                               HTTP_X_FORWARDED_FOR='2.2.2.2')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
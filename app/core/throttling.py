@@ -0,0 +1,130 @@
+import collections
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+def parse_rate(rate):
+    """Return (requests, seconds) for a rate like '100/min'"""
+    num, period = rate.split('/')
+    duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return int(num), duration
+
+
+class LocalTokenBucket:
+    """In-process token buckets keyed by scope and client
+
+    Each bucket is a (tokens, timestamp) tuple replaced with a single dict
+    assignment, so no lock is taken. Concurrent requests for the same key
+    may race and over-admit by at most one request per thread. Buckets are
+    kept in least recently used order and the oldest is dropped once there
+    are more than max_buckets.
+    """
+    max_buckets = 100000
+
+    def __init__(self):
+        self.buckets = collections.OrderedDict()
+
+    def clear(self):
+        self.buckets.clear()
+
+    def _store(self, key, bucket):
+        """Save bucket as the most recently used, evicting the oldest"""
+        self.buckets.pop(key, None)
+        self.buckets[key] = bucket
+        if len(self.buckets) > self.max_buckets:
+            try:
+                self.buckets.popitem(last=False)
+            except KeyError:
+                pass
+
+    def consume(self, key, num_requests, duration):
+        """Take a token from the bucket, returning seconds to wait if empty"""
+        now = time.monotonic()
+        refill_rate = num_requests / duration
+        tokens, stamp = self.buckets.get(key, (num_requests, now))
+        tokens = min(num_requests, tokens + (now - stamp) * refill_rate)
+
+        if tokens >= 1:
+            self._store(key, (tokens - 1, now))
+            return None
+
+        self._store(key, (tokens, now))
+        return (1 - tokens) / refill_rate
+
+
+class CacheWindowCounter:
+    """Fixed window counters in the Django cache shared by all nodes
+
+    Relies on the atomic `incr` of cache backends such as Memcached or
+    Redis, so the limit holds across processes and hosts.
+    """
+
+    def clear(self):
+        pass
+
+    def consume(self, key, num_requests, duration):
+        now = time.time()
+        window = int(now // duration)
+        cache_key = f'throttle:{key}:{window}'
+        cache.add(cache_key, 0, duration)
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            cache.add(cache_key, 1, duration)
+            count = 1
+
+        if count <= num_requests:
+            return None
+        return (window + 1) * duration - now
+
+
+BACKENDS = {
+    'local': LocalTokenBucket(),
+    'cache': CacheWindowCounter(),
+}
+
+
+class ScopedRateThrottle(BaseThrottle):
+    """Throttle each user or client address at a rate chosen per action
+
+    Views and actions may set `throttle_scope`; otherwise safe methods use
+    the `read` rate and other methods the `write` rate. Rates come from
+    DEFAULT_THROTTLE_RATES and the backend from THROTTLE_BACKEND.
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in ('GET', 'HEAD', 'OPTIONS') \
+            else 'write'
+
+    def get_client(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self.delay = None
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        num_requests, duration = parse_rate(rate)
+        backend = BACKENDS[settings.THROTTLE_BACKEND]
+        self.delay = backend.consume(
+            f'{scope}:{self.get_client(request)}',
+            num_requests,
+            duration
+        )
+        return self.delay is None
+
+    def wait(self):
+        return self.delay
@@ -0,0 +1,216 @@
+import heapq
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+
+from core.models import Change, Recipe, changes_since
+
+
+RELATIONS = {
+    'tags': Change.TAG,
+    'ingredients': Change.INGREDIENT,
+}
+
+
+class RecipeIndex:
+    """Inverted index of one user's recipes by tag and ingredient
+
+    Maps each tag and ingredient to the recipes using it, so comparing a
+    recipe or an ingredient list against every recipe only visits the
+    recipes sharing something with it. The index follows the user's change
+    log, reloading only the recipes changed since it was last read.
+    """
+    replay_limit = 1000
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.lock = threading.Lock()
+        self.built_at = None
+        self.last_change = 0
+        self.applied = set()
+        self.features = {}
+        self.postings = {}
+        self.sizes = {}
+
+    def _rows(self, name, **filters):
+        """Return (recipe id, related id) rows of a recipe relation"""
+        field = Recipe._meta.get_field(name)
+        return field.remote_field.through.objects.filter(
+            **filters
+        ).values_list(field.m2m_column_name(), field.m2m_reverse_name())
+
+    def _load(self, recipe_ids, **filters):
+        for recipe_id in recipe_ids:
+            self.features[recipe_id] = {name: set() for name in RELATIONS}
+            self.sizes[recipe_id] = 0
+        for name in RELATIONS:
+            for recipe_id, item_id in self._rows(name, **filters):
+                if recipe_id not in self.features:
+                    # Created after the recipes were read
+                    continue
+                self.features[recipe_id][name].add(item_id)
+                self.sizes[recipe_id] += 1
+                self.postings[name][item_id].add(recipe_id)
+
+    def _discard_recipe(self, recipe_id):
+        self.sizes.pop(recipe_id, None)
+        features = self.features.pop(recipe_id, {})
+        for name, items in features.items():
+            for item_id in items:
+                self.postings[name][item_id].discard(recipe_id)
+
+    def _discard_item(self, name, item_id):
+        for recipe_id in self.postings[name].pop(item_id, ()):
+            self.features[recipe_id][name].discard(item_id)
+            self.sizes[recipe_id] -= 1
+
+    def build(self):
+        """Load all of the user's recipes"""
+        # Read the cursor first, so changes made while loading are replayed.
+        # Changes already visible are reflected by the load; only ones
+        # committing later need replaying from the window behind it
+        self.last_change = Change.objects.filter(
+            user_id=self.user_id
+        ).order_by('-id').values_list('id', flat=True).first() or 0
+        window = changes_since(self.user_id, self.last_change, 0)
+        self.applied = {row[0] for row in window[0]} if window else set()
+        self.features = {}
+        self.sizes = {}
+        self.postings = {name: defaultdict(set) for name in RELATIONS}
+        self._load(
+            Recipe.objects.filter(
+                user_id=self.user_id
+            ).values_list('id', flat=True),
+            recipe__user_id=self.user_id
+        )
+        self.built_at = time.monotonic()
+
+    def refresh(self):
+        """Apply the user's changes since the index was last refreshed"""
+        with self.lock:
+            if self.built_at is None or time.monotonic() - self.built_at > \
+                    settings.RECIPE_INDEX_MAX_AGE:
+                self.build()
+                return
+
+            changes = changes_since(self.user_id, self.last_change,
+                                    self.replay_limit)
+            if changes is None or len(changes[1]) > self.replay_limit:
+                self.build()
+                return
+            window, changes = changes
+            late = [row for row in window if row[0] not in self.applied]
+            self.applied = {row[0] for row in window + changes}
+            if not late and not changes:
+                return
+
+            recipe_ids = set()
+            for _, model, object_id, deleted in late + changes:
+                if model == Change.RECIPE:
+                    recipe_ids.add(object_id)
+                elif deleted:
+                    # Deleting a tag or ingredient removes it from recipes
+                    # without recording the recipes as changed
+                    for name, relation_model in RELATIONS.items():
+                        if model == relation_model:
+                            self._discard_item(name, object_id)
+
+            for recipe_id in recipe_ids:
+                self._discard_recipe(recipe_id)
+            self._load(
+                Recipe.objects.filter(
+                    user_id=self.user_id,
+                    id__in=recipe_ids
+                ).values_list('id', flat=True),
+                recipe_id__in=recipe_ids
+            )
+            if changes:
+                self.last_change = changes[-1][0]
+
+    def similar(self, recipe_id, metric='jaccard', limit=10):
+        """Return (score, recipe id) of the recipes most like recipe_id
+
+        Recipes are compared by their combined tags and ingredients, with
+        Jaccard or cosine similarity. Recipes sharing nothing are left out.
+        """
+        with self.lock:
+            target = self.features.get(recipe_id)
+            if target is None:
+                return []
+
+            shared = Counter()
+            for name, items in target.items():
+                for item_id in items:
+                    shared.update(self.postings[name].get(item_id, ()))
+            shared.pop(recipe_id, None)
+
+            size = self.sizes[recipe_id]
+            sizes = self.sizes
+            if metric == 'cosine':
+                scores = [(count / math.sqrt(size * sizes[other_id]),
+                           -other_id)
+                          for other_id, count in shared.items()]
+            else:
+                scores = [(count / (size + sizes[other_id] - count),
+                           -other_id)
+                          for other_id, count in shared.items()]
+
+        return [(score, -negative_id) for score, negative_id in
+                heapq.nlargest(limit, scores)]
+
+    def cookable(self, have, max_missing=0, limit=50):
+        """Return (missing ingredient ids, recipe id) for cookable recipes
+
+        A recipe is cookable when at most `max_missing` of its ingredients
+        are not in `have`, so with `max_missing` a recipe sharing none of
+        them may qualify and every recipe is visited. Recipes missing the
+        fewest come first; recipes without ingredients are left out.
+        """
+        have = set(have)
+        with self.lock:
+            covered = Counter()
+            for item_id in have:
+                covered.update(
+                    self.postings['ingredients'].get(item_id, ())
+                )
+
+            results = []
+            for recipe_id, count in covered.items():
+                ingredients = self.features[recipe_id]['ingredients']
+                if len(ingredients) - count <= max_missing:
+                    results.append((sorted(ingredients - have), recipe_id))
+            if max_missing:
+                # Recipes sharing no ingredient can still be short enough
+                for recipe_id, features in self.features.items():
+                    ingredients = features['ingredients']
+                    if recipe_id not in covered and \
+                            0 < len(ingredients) <= max_missing:
+                        results.append((sorted(ingredients), recipe_id))
+
+        return heapq.nsmallest(limit, results,
+                               key=lambda result: (len(result[0]),
+                                                   result[1]))
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def recipe_index(user):
+    """Return the user's refreshed recipe index, caching recent users"""
+    with _indexes_lock:
+        index = _indexes.pop(user.pk, None) or RecipeIndex(user.pk)
+        _indexes[user.pk] = index
+        while len(_indexes) > settings.RECIPE_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+
+    index.refresh()
+    return index
+
+
+def clear():
+    with _indexes_lock:
+        _indexes.clear()
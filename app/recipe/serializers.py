@@ -1,9 +1,154 @@
+import time
+import warnings
+
+from PIL import Image
+
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from core.models import Tag, Ingredient, Recipe
 
+from recipe.signals import record_bulk_changes
+
+
+class DynamicFieldsMixin:
+    """Restrict the serializer output to the `fields` kwarg, if given"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Many related field resolving all primary keys in one query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        return self.child_relation.to_internal_values(data)
+
+
+class UserRelatedField(serializers.PrimaryKeyRelatedField):
+    """Related field taking primary keys or names of the user's objects
+
+    Integers and numeric strings are primary keys. Other strings, or
+    objects like `{"name": "Vegan"}`, are names; names not found resolve
+    to unsaved instances that are created when the recipe is saved.
+    """
+    default_error_messages = {
+        'invalid_name': 'Invalid name "{name}".',
+    }
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None:
+            queryset = queryset.filter(user=request.user)
+        return queryset
+
+    def _parse(self, item):
+        """Return (pk, None) or (None, name) for an input item"""
+        if isinstance(item, dict):
+            item = item.get('name')
+            if not isinstance(item, str):
+                self.fail('invalid_name', name=item)
+            return None, self._validate_name(item)
+        if isinstance(item, int) and not isinstance(item, bool):
+            return item, None
+        if isinstance(item, str):
+            if item.isdigit():
+                return int(item), None
+            return None, self._validate_name(item)
+
+        self.fail('incorrect_type', data_type=type(item).__name__)
+
+    def _validate_name(self, name):
+        name = name.strip()
+        max_length = self.get_queryset().model._meta.get_field(
+            'name'
+        ).max_length
+        if not name or len(name) > max_length:
+            self.fail('invalid_name', name=name)
+        if self.context.get('request') is None:
+            self.fail('does_not_exist', pk_value=name)
+        return name
+
+    def to_internal_values(self, data):
+        """Return the objects for a list of primary keys and names"""
+        items = list(dict.fromkeys(self._parse(item) for item in data))
+        if not items:
+            return []
+
+        pks = [pk for pk, name in items if name is None]
+        names = [name for pk, name in items if name is not None]
+        queryset = self.get_queryset()
+        found = list(queryset.filter(
+            models.Q(pk__in=pks) | models.Q(name__in=names)
+        ))
+        by_pk = {obj.pk: obj for obj in found}
+        by_name = {obj.name: obj for obj in found}
+
+        objects = []
+        for pk, name in items:
+            if name is None:
+                if pk not in by_pk:
+                    self.fail('does_not_exist', pk_value=pk)
+                obj = by_pk[pk]
+            else:
+                if name not in by_name:
+                    by_name[name] = queryset.model(
+                        user=self.context['request'].user,
+                        name=name
+                    )
+                obj = by_name[name]
+            if obj not in objects:
+                objects.append(obj)
+
+        return objects
+
+
+class UserNameSerializer(serializers.ModelSerializer):
+    """Serializes objects whose name is unique per user"""
 
-class TagSerializer(serializers.ModelSerializer):
+    def validate_name(self, value):
+        """Check that the user has no other object with this name"""
+        request = self.context.get('request')
+        if request is None:
+            return value
+
+        queryset = self.Meta.model.objects.filter(
+            user=request.user,
+            name=value
+        )
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(
+                f'{self.Meta.model.__name__} with this name already exists'
+            )
+
+        return value
+
+
+class TagSerializer(UserNameSerializer):
     """Serializes tag object"""
 
     class Meta:
@@ -12,7 +157,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UserNameSerializer):
     """Serializes ingredient object"""
 
     class Meta:
@@ -21,13 +166,14 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serialize recipe object"""
-    ingredients = serializers.PrimaryKeyRelatedField(
+    relation_fields = ('tags', 'ingredients')
+    ingredients = UserRelatedField(
         many=True,
         queryset=Ingredient.objects.all(),
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -43,6 +189,95 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'link')
         read_only_fields = ('id',)
 
+    def _save_new(self, objects):
+        """Bulk create the unsaved objects and return all objects saved"""
+        new = [obj for obj in objects if obj.pk is None]
+        if not new:
+            return objects
+
+        model = type(new[0])
+        user_id = new[0].user_id
+        names = [obj.name for obj in new]
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(new)
+        except IntegrityError:
+            # Another request created some of the names concurrently
+            for name in names:
+                model.objects.get_or_create(user_id=user_id, name=name)
+            created = False
+        else:
+            created = True
+
+        saved = {obj.name: obj for obj in model.objects.filter(
+            user_id=user_id,
+            name__in=names
+        )}
+        if created:
+            record_bulk_changes(model, saved.values())
+
+        return [saved[obj.name] if obj.pk is None else obj
+                for obj in objects]
+
+    def _set_relation(self, recipe, name, objects, created=False):
+        """Insert and delete only the changed through rows of a relation"""
+        field = Recipe._meta.get_field(name)
+        through = field.remote_field.through
+        source = field.m2m_column_name()
+        target = field.m2m_reverse_name()
+
+        wanted = {obj.pk for obj in self._save_new(objects)}
+        if created:
+            existing = set()
+        else:
+            existing = set(through.objects.filter(
+                **{source: recipe.pk}
+            ).values_list(target, flat=True))
+
+        removed = existing - wanted
+        if removed:
+            through.objects.filter(
+                **{source: recipe.pk, f'{target}__in': removed}
+            ).delete()
+
+        added = wanted - existing
+        if added:
+            through.objects.bulk_create([
+                through(**{source: recipe.pk, target: pk}) for pk in added
+            ])
+
+    def _pop_relations(self, validated_data):
+        return {name: validated_data.pop(name)
+                for name in self.relation_fields
+                if name in validated_data}
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Create a recipe, writing each relation in one bulk insert"""
+        relations = self._pop_relations(validated_data)
+        recipe = Recipe.objects.create(**validated_data)
+        for name, objects in relations.items():
+            self._set_relation(recipe, name, objects, created=True)
+
+        return recipe
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Update a recipe, writing only the changed relation rows"""
+        relations = self._pop_relations(validated_data)
+        if relations:
+            # Concurrent updates would otherwise both insert a row missing
+            # from what they read, so lock the recipe before reading its
+            # rows rather than trusting prefetched relations
+            Recipe.objects.select_for_update().filter(
+                pk=instance.pk
+            ).values_list('pk').get()
+        recipe = super().update(instance, validated_data)
+        for name, objects in relations.items():
+            self._set_relation(recipe, name, objects)
+
+        return recipe
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serialize a recipe detail"""
@@ -50,8 +285,62 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class ImageUploadField(serializers.FileField):
+    """Image upload validated from its header, without decoding pixels
+
+    Byte size, format and dimensions are checked against the
+    IMAGE_UPLOAD_* settings, so oversized uploads and decompression bombs
+    are rejected before anything decodes them. The time spent validating
+    is kept in `validation_time`, in seconds.
+    """
+    default_error_messages = {
+        'invalid_image': 'Upload a valid image. The file you uploaded was '
+                         'either not an image or a corrupted image.',
+        'max_bytes': 'Ensure the image has at most {max_bytes} bytes.',
+        'max_pixels': 'Ensure the image has at most {max_pixels} pixels.',
+        'format': 'Unsupported image format {format}.',
+    }
+    validation_time = None
+
+    def to_internal_value(self, data):
+        start = time.perf_counter()
+        try:
+            return self._validate_image(super().to_internal_value(data))
+        finally:
+            self.validation_time = time.perf_counter() - start
+
+    def _validate_image(self, file):
+        max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+        if file.size > max_bytes:
+            self.fail('max_bytes', max_bytes=max_bytes)
+
+        max_pixels = settings.IMAGE_UPLOAD_MAX_PIXELS
+        try:
+            # Opening reads only the header; the pixel limit below is
+            # stricter than Pillow's own bomb warning
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                image = Image.open(file)
+        except Image.DecompressionBombError:
+            self.fail('max_pixels', max_pixels=max_pixels)
+        except Exception:
+            self.fail('invalid_image')
+
+        if image.format not in settings.IMAGE_UPLOAD_FORMATS:
+            self.fail('format', format=image.format)
+        width, height = image.size
+        if width * height > max_pixels:
+            self.fail('max_pixels', max_pixels=max_pixels)
+
+        file.image = image
+        file.content_type = Image.MIME.get(image.format)
+        file.seek(0)
+        return file
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
+    image = ImageUploadField()
 
     class Meta:
         model = Recipe
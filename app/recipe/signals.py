@@ -0,0 +1,91 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, pre_delete, \
+                                     m2m_changed
+
+from core.models import Change, Tag, Ingredient, Recipe
+
+
+TRACKED_MODELS = {
+    Recipe: Change.RECIPE,
+    Tag: Change.TAG,
+    Ingredient: Change.INGREDIENT,
+}
+
+# Users whose deletion is in progress on this thread. Their objects are
+# removed by cascade and their change log goes with them, so nothing is
+# recorded for them.
+_deleting = threading.local()
+
+
+def _deleting_users():
+    if not hasattr(_deleting, 'users'):
+        _deleting.users = set()
+    return _deleting.users
+
+
+def record_change(sender, instance, **kwargs):
+    """Record a saved or deleted recipe, tag or ingredient"""
+    if instance.user_id in _deleting_users():
+        return
+
+    Change.objects.create(
+        user_id=instance.user_id,
+        model=TRACKED_MODELS[sender],
+        object_id=instance.pk,
+        deleted=kwargs.get('signal') is post_delete
+    )
+
+
+def record_bulk_changes(model, objects):
+    """Record objects saved with bulk_create, which sends no signals"""
+    Change.objects.bulk_create([
+        Change(user_id=obj.user_id, model=TRACKED_MODELS[model],
+               object_id=obj.pk)
+        for obj in objects
+    ])
+
+
+def record_recipe_relations(sender, instance, action, pk_set, **kwargs):
+    """Record recipes whose tags or ingredients changed"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if isinstance(instance, Recipe):
+        recipes = [instance]
+    elif pk_set:
+        recipes = Recipe.objects.filter(pk__in=pk_set).only('id', 'user')
+    else:
+        return
+
+    Change.objects.bulk_create([
+        Change(user_id=recipe.user_id, model=Change.RECIPE,
+               object_id=recipe.pk)
+        for recipe in recipes
+        if recipe.user_id not in _deleting_users()
+    ])
+
+
+def start_user_deletion(sender, instance, **kwargs):
+    _deleting_users().add(instance.pk)
+
+
+def finish_user_deletion(sender, instance, **kwargs):
+    _deleting_users().discard(instance.pk)
+
+
+def connect():
+    """Connect change log receivers to the tracked models"""
+    for model in TRACKED_MODELS:
+        post_save.connect(record_change, sender=model)
+        post_delete.connect(record_change, sender=model)
+
+    m2m_changed.connect(record_recipe_relations,
+                        sender=Recipe.tags.through)
+    m2m_changed.connect(record_recipe_relations,
+                        sender=Recipe.ingredients.through)
+
+    user_model = get_user_model()
+    pre_delete.connect(start_user_deletion, sender=user_model)
+    post_delete.connect(finish_user_deletion, sender=user_model)
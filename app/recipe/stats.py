@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+from django.db.models import Avg, Count, Max, Min, Q
+
+from core.models import Tag, Ingredient, Recipe
+
+
+PRICE_BUCKETS = (5, 10, 20, 50)
+
+
+def _price(value):
+    """Format a price aggregate like the serializers format prices"""
+    if value is None:
+        return None
+    return str(Decimal(str(value)).quantize(Decimal('0.01')))
+
+
+def _price_ranges():
+    """Return (low, high) bounds for each price bucket"""
+    edges = (0,) + PRICE_BUCKETS + (None,)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _usage(model, user):
+    """Return the user's objects of model with their recipe counts"""
+    return list(model.objects.filter(user=user).annotate(
+        recipe_count=Count('recipe')
+    ).values('id', 'name', 'recipe_count').order_by('-recipe_count', 'name'))
+
+
+def recipe_stats(user):
+    """Return aggregate statistics over the recipes of user
+
+    Totals and the price distribution come from a single aggregate query,
+    and tag and ingredient usage from one grouped query each, so the cost
+    does not depend on how many rows the client would otherwise download.
+    """
+    ranges = _price_ranges()
+    buckets = {}
+    for i, (low, high) in enumerate(ranges):
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        buckets[f'bucket_{i}'] = Count('id', filter=condition)
+
+    totals = Recipe.objects.filter(user=user).aggregate(
+        count=Count('id'),
+        time_avg=Avg('time_minutes'),
+        time_min=Min('time_minutes'),
+        time_max=Max('time_minutes'),
+        price_avg=Avg('price'),
+        price_min=Min('price'),
+        price_max=Max('price'),
+        **buckets
+    )
+
+    time_avg = totals['time_avg']
+    return {
+        'recipe_count': totals['count'],
+        'time_minutes': {
+            'avg': round(time_avg, 2) if time_avg is not None else None,
+            'min': totals['time_min'],
+            'max': totals['time_max'],
+        },
+        'price': {
+            'avg': _price(totals['price_avg']),
+            'min': _price(totals['price_min']),
+            'max': _price(totals['price_max']),
+            'distribution': [
+                {'min': low, 'max': high, 'count': totals[f'bucket_{i}']}
+                for i, (low, high) in enumerate(ranges)
+            ],
+        },
+        'tags': _usage(Tag, user),
+        'ingredients': _usage(Ingredient, user),
+    }
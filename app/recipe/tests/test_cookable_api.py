@@ -0,0 +1,102 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Ingredient
+
+from recipe import index
+
+
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+
+
+class PrivateCookableApiTests(TestCase):
+    """Test the cookable recipes API"""
+
+    def setUp(self):
+        index.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.rice, self.tofu, self.egg, self.flour = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Rice', 'Tofu', 'Egg', 'Flour')
+        ]
+        self.sample_recipe('Plain rice', [self.rice])
+        self.sample_recipe('Tofu rice', [self.rice, self.tofu])
+        self.sample_recipe('Fried rice', [self.rice, self.tofu, self.egg])
+        self.sample_recipe('Cake', [self.egg, self.flour])
+        self.sample_recipe('Water', [])
+
+    def sample_recipe(self, title, ingredients):
+        recipe = Recipe.objects.create(user=self.user, title=title,
+                                       time_minutes=10, price=5)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def get_cookable(self, have, **params):
+        params['have'] = ','.join(str(item.id) for item in have)
+        res = self.client.get(COOKABLE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(item['title'], item['missing']) for item in res.data]
+
+    def test_cookable(self):
+        """Test listing recipes made only from the given ingredients"""
+        self.assertEqual(self.get_cookable([self.rice, self.tofu]), [
+            ('Plain rice', []),
+            ('Tofu rice', []),
+        ])
+
+    def test_cookable_max_missing(self):
+        """Test ranking recipes by the number of missing ingredients"""
+        self.assertEqual(
+            self.get_cookable([self.rice, self.tofu], max_missing=1),
+            [
+                ('Plain rice', []),
+                ('Tofu rice', []),
+                ('Fried rice', [self.egg.id]),
+            ]
+        )
+
+    def test_cookable_max_missing_without_shared(self):
+        """Test that short recipes sharing no ingredient are included"""
+        self.assertEqual(self.get_cookable([self.flour], max_missing=1), [
+            ('Plain rice', [self.rice.id]),
+            ('Cake', [self.egg.id]),
+        ])
+
+    def test_cookable_follows_changes(self):
+        """Test that added and removed ingredients are reflected"""
+        self.assertEqual(self.get_cookable([self.egg, self.flour]),
+                         [('Cake', [])])
+
+        cake = Recipe.objects.get(title='Cake')
+        cake.ingredients.add(self.tofu)
+        self.assertEqual(self.get_cookable([self.egg, self.flour]), [])
+
+        self.tofu.delete()
+        self.assertEqual(self.get_cookable([self.egg, self.flour]),
+                         [('Cake', [])])
+
+    def test_cookable_other_users_ingredients(self):
+        """Test that other users' recipes are never listed"""
+        other = get_user_model().objects.create_user('other@bocon.cloud')
+        rice = Ingredient.objects.create(user=other, name='Rice')
+        Recipe.objects.create(user=other, title='Rice', time_minutes=5,
+                              price=5).ingredients.add(rice)
+
+        self.assertEqual(self.get_cookable([rice]), [])
+
+    def test_cookable_invalid_params(self):
+        """Test that missing or invalid params are rejected"""
+        for params in ({}, {'have': 'rice'}, {'have': '1', 'max_missing': -1},
+                       {'have': '1', 'limit': 500}):
+            res = self.client.get(COOKABLE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -29,13 +29,16 @@ class PublicIngredientApiTests(TestCase):
 class PrivateIngredientApiTests(TestCase):
     """Test for authorized Ingredient APIs"""
 
-    def setUp(self):
-        self.client = APIClient()
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             email='test@bocon.cloud',
             password='testPass',
             name='Test'
         )
+
+    def setUp(self):
+        self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
     def test_retrieve_ingredients_success(self):
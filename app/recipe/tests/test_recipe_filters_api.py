@@ -0,0 +1,175 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Latte',
+        'time_minutes': 10,
+        'price': 5.5
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def explain(sql):
+    """Return the query plan for sql, preferring index scans"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+        else:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(' '.join(map(str, row))
+                         for row in cursor.fetchall())
+
+
+def recipe_query_plan(client, params):
+    """Return the plan of the recipe list query for params"""
+    with CaptureQueriesContext(connection) as ctx:
+        client.get(RECIPE_URL, params)
+    sql = next(query['sql'] for query in ctx.captured_queries
+               if 'FROM "core_recipe"' in query['sql'])
+    return explain(sql)
+
+
+class RecipeFilterApiTests(TestCase):
+    """Test filtering and ordering the recipe list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass'
+        )
+        cls.quick = sample_recipe(user=cls.user, title='Toast',
+                                  time_minutes=5, price=2)
+        cls.medium = sample_recipe(user=cls.user, title='Tacos',
+                                   time_minutes=20, price=8)
+        cls.slow = sample_recipe(user=cls.user, title='Roast',
+                                 time_minutes=90, price=25)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get_ids(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data]
+
+    def test_filter_max_time(self):
+        """Test filtering recipes by maximum preparation time"""
+        ids = self.get_ids({'max_time': 20})
+
+        self.assertEqual(ids, [self.medium.id, self.quick.id])
+
+    def test_filter_price_range(self):
+        """Test filtering recipes by price range"""
+        ids = self.get_ids({'min_price': '5', 'max_price': '10.00'})
+
+        self.assertEqual(ids, [self.medium.id])
+
+    def test_filter_title_prefix(self):
+        """Test filtering recipes by case-insensitive title prefix"""
+        ids = self.get_ids({'title_prefix': 'ta'})
+
+        self.assertEqual(ids, [self.medium.id])
+
+    def test_ordering(self):
+        """Test ordering by whitelisted fields"""
+        self.assertEqual(self.get_ids({'ordering': 'price'}),
+                         [self.quick.id, self.medium.id, self.slow.id])
+        self.assertEqual(self.get_ids({'ordering': '-time_minutes'}),
+                         [self.slow.id, self.medium.id, self.quick.id])
+        self.assertEqual(self.get_ids({'ordering': 'title'}),
+                         [self.slow.id, self.medium.id, self.quick.id])
+
+    def test_blank_ordering(self):
+        """Test that a blank ordering uses the default ordering"""
+        self.assertEqual(self.get_ids({'ordering': ''}),
+                         self.get_ids({}))
+
+    def test_invalid_params(self):
+        """Test that invalid filter values and orderings are rejected"""
+        for params in ({'ordering': 'user'}, {'max_time': 'soon'},
+                       {'min_price': 'nan'}):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_default_ordering_uses_index(self):
+        """Test that the default listing is served by the user/id index"""
+        plan = recipe_query_plan(self.client, {})
+
+        self.assertIn('recipe_user_id_idx', plan)
+
+
+class RecipeFilterPlanTests(TestCase):
+    """Test that filters with the default ordering use their indexes
+
+    Each filter index covers the user and the filtered column but not the
+    default -id ordering, so the few matching rows are sorted after the
+    index scan. The planner prefers that over walking all of the user's
+    recipes on the user/id index only when the filter is selective, so the
+    tests run against two users with many non-matching recipes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass'
+        )
+        other = get_user_model().objects.create_user(
+            email='other@bocon.cloud',
+            password='testPass'
+        )
+        Recipe.objects.bulk_create([
+            Recipe(user=user, title=f'Recipe {i}',
+                   time_minutes=30 + i % 100, price=50 + i % 50)
+            for user in (cls.user, other) for i in range(2000)
+        ])
+        sample_recipe(user=cls.user, title='Toast', time_minutes=5, price=2)
+        sample_recipe(user=cls.user, title='Tacos', time_minutes=20, price=8)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE core_recipe')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_time_filter_uses_index(self):
+        """Test that the time filter is served by the user/time index"""
+        plan = recipe_query_plan(self.client, {'max_time': 20})
+
+        self.assertIn('recipe_user_time_idx', plan)
+
+    def test_price_filter_uses_index(self):
+        """Test that the price filter is served by the user/price index"""
+        plan = recipe_query_plan(self.client, {'min_price': 5,
+                                               'max_price': 10})
+
+        self.assertIn('recipe_user_price_idx', plan)
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+    def test_title_prefix_uses_index(self):
+        """Test that the title prefix is served by the expression index"""
+        plan = recipe_query_plan(self.client, {'title_prefix': 'ta'})
+
+        self.assertIn('recipe_user_title_upper_like', plan)
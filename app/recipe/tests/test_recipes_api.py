@@ -1,9 +1,11 @@
 import tempfile
-import os
+from unittest.mock import patch
 
-from PIL import Image
+from PIL import Image, ImageFile
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
@@ -67,13 +69,16 @@ class PublicRecipeApiTests(TestCase):
 class PrivateRecipeApiTests(TestCase):
     """Test the authorized Recipe APIs"""
 
-    def setUp(self):
-        self.client = APIClient()
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             email='test@bocon.cloud',
             password='testPass',
             name='Test'
         )
+
+    def setUp(self):
+        self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
     def test_list_recipes_success(self):
@@ -182,16 +187,260 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingred1, ingreds)
         self.assertIn(ingred2, ingreds)
 
+    def test_create_recipe_with_other_users_tag(self):
+        """Test that tags of another user cannot be assigned"""
+        user2 = get_user_model().objects.create_user(
+            email='test2@bocon.cloud',
+            password='testPass2'
+        )
+        tag = sample_tag(user=user2)
+        payload = {
+            'title': 'Cappucino',
+            'time_minutes': 10,
+            'price': 20.5,
+            'tags': [tag.id]
+        }
+
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_query_count_constant(self):
+        """Test that the number of queries does not grow with tags"""
+        def create_with_tags(count):
+            tags = [sample_tag(user=self.user, name=f'Tag {count}-{i}')
+                    for i in range(count)]
+            payload = {
+                'title': 'Cappucino',
+                'time_minutes': 10,
+                'price': 20.5,
+                'tags': [tag.id for tag in tags]
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(RECIPE_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['tags']), count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(create_with_tags(2), create_with_tags(30))
+
+    def test_create_recipe_with_tag_names(self):
+        """Test that tags can be given by name and are created once"""
+        tag = sample_tag(user=self.user, name='Breakfast')
+        payload = {
+            'title': 'Pancakes',
+            'time_minutes': 20,
+            'price': 4.5,
+            'tags': [tag.id, 'Breakfast', {'name': 'Sweet'}, 'Sweet'],
+            'ingredients': ['Flour', 'Milk']
+        }
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Breakfast', 'Sweet']
+        )
+        self.assertEqual(
+            sorted(recipe.ingredients.values_list('name', flat=True)),
+            ['Flour', 'Milk']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_tag_names_scoped_to_user(self):
+        """Test that names create new tags instead of using other users'"""
+        user2 = get_user_model().objects.create_user(
+            email='test2@bocon.cloud',
+            password='testPass2'
+        )
+        other = sample_tag(user=user2, name='Vegan')
+        payload = {
+            'title': 'Salad',
+            'time_minutes': 5,
+            'price': 3,
+            'tags': ['Vegan'],
+            'ingredients': []
+        }
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(res.data['tags'], [other.id])
+        self.assertTrue(Tag.objects.filter(user=self.user,
+                                           name='Vegan').exists())
+
+    def test_invalid_tag_name(self):
+        """Test that blank tag names are rejected"""
+        payload = {
+            'title': 'Salad',
+            'time_minutes': 5,
+            'price': 3,
+            'tags': [' '],
+            'ingredients': []
+        }
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_partial_update_recipe_relations(self):
+        """Test that updating tags only changes the differing rows"""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Breakfast')
+        tag2 = sample_tag(user=self.user, name='Lunch')
+        tag3 = sample_tag(user=self.user, name='Dinner')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.patch(detail_url(recipe.id),
+                                {'tags': [tag2.id, tag3.id]})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(recipe.tags.all()), {tag2, tag3})
+
+    def test_update_relations_added_concurrently(self):
+        """Test that rows written since the recipe was read are kept"""
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        instance = Recipe.objects.prefetch_related('tags').get(id=recipe.id)
+        # Another request adds the tag after this one loaded the recipe
+        recipe.tags.add(tag)
+
+        serializer = RecipeSerializer(instance, data={'tags': [tag.id]},
+                                      partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(list(recipe.tags.all()), [tag])
+
+    def test_full_update_recipe(self):
+        """Test that a full update replaces the relations"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        payload = {
+            'title': 'Spaghetti',
+            'time_minutes': 25,
+            'price': 5.00
+        }
+
+        res = self.client.put(detail_url(recipe.id), payload)
+
+        recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(recipe.title, payload['title'])
+        self.assertEqual(recipe.tags.count(), 0)
+
+    def test_list_recipes_sparse_fields(self):
+        """Test that fields limits output and skips relation queries"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': recipe.id, 'title': recipe.title}])
+
+    def test_list_recipes_exclude_fields(self):
+        """Test that exclude removes fields from output"""
+        sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, {'exclude': 'tags,ingredients'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('tags', res.data[0])
+        self.assertNotIn('ingredients', res.data[0])
+        self.assertIn('title', res.data[0])
+
+    def test_list_recipes_prefetches_relations(self):
+        """Test that relations are loaded with one query each"""
+        for i in range(3):
+            recipe = sample_recipe(user=self.user)
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            )
+
+        with self.assertNumQueries(3):
+            self.client.get(RECIPE_URL)
+
+    def test_detail_sparse_fields(self):
+        """Test that fields applies to the recipe detail"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        res = self.client.get(detail_url(recipe.id), {'fields': 'tags'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data), ['tags'])
+        self.assertEqual(res.data['tags'][0]['name'], 'Main course')
+
+    def test_unknown_sparse_field(self):
+        """Test that requesting an unknown field is rejected"""
+        res = self.client.get(RECIPE_URL, {'fields': 'title,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_recipes_include_relations(self):
+        """Test that include side-loads deduplicated related objects"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        for recipe in (recipe1, recipe2):
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL,
+                                  {'include': 'tags,ingredients'})
+
+        recipes = Recipe.objects.all().order_by('-id')
+        serializer = RecipeSerializer(recipes, many=True)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['data'], serializer.data)
+        self.assertEqual(res.data['included']['tags'],
+                         [{'id': tag.id, 'name': tag.name}])
+        self.assertEqual(res.data['included']['ingredients'],
+                         [{'id': ingredient.id, 'name': ingredient.name}])
+
+    def test_include_with_sparse_fields(self):
+        """Test that include loads relations left out of fields"""
+        tag = sample_tag(user=self.user)
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL,
+                              {'include': 'tags', 'fields': 'title'})
+
+        self.assertEqual(res.data['data'], [{'title': recipe.title}])
+        self.assertEqual(res.data['included'],
+                         {'tags': [{'id': tag.id, 'name': tag.name}]})
+
+    def test_unknown_include(self):
+        """Test that including an unknown relation is rejected"""
+        res = self.client.get(RECIPE_URL, {'include': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class RecipeImageUploadTests(TestCase):
 
-    def setUp(self):
-        self.client = APIClient()
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             email='test@bocon.cloud',
             password='testPass',
             name='Test'
         )
+
+    def setUp(self):
+        self.client = APIClient()
         self.client.force_authenticate(self.user)
         self.recipe = sample_recipe(user=self.user)
 
@@ -212,7 +461,8 @@ class RecipeImageUploadTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('image', res.data)
-        self.assertTrue(os.path.exists(self.recipe.image.path))
+        storage = self.recipe.image.storage
+        self.assertTrue(storage.exists(self.recipe.image.name))
 
     def test_upload_image_bad_request(self):
         """Test upload invalid image"""
@@ -223,6 +473,51 @@ class RecipeImageUploadTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def _upload(self, size=(10, 10), format='JPEG', suffix='.jpg'):
+        with tempfile.NamedTemporaryFile(suffix=suffix) as ntf:
+            Image.new('RGB', size).save(ntf, format=format)
+            ntf.seek(0)
+            return self.client.post(image_upload_url(self.recipe.id),
+                                    {'image': ntf}, format='multipart')
+
+    def test_upload_image_not_decoded(self):
+        """Test that uploads are validated without decoding the pixels"""
+        with patch.object(ImageFile.ImageFile, 'load') as load:
+            res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        load.assert_not_called()
+        self.assertTrue(res['Server-Timing'].startswith(
+            'image-validation;dur='
+        ))
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=100)
+    def test_upload_image_too_many_bytes(self):
+        """Test that images over the byte limit are rejected"""
+        res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'],
+                         ['Ensure the image has at most 100 bytes.'])
+        self.assertIn('Server-Timing', res)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000 * 1000)
+    def test_upload_image_too_many_pixels(self):
+        """Test that images with huge dimensions are rejected"""
+        res = self._upload(size=(2000, 1000), format='PNG', suffix='.png')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'],
+                         ['Ensure the image has at most 1000000 pixels.'])
+
+    def test_upload_image_unsupported_format(self):
+        """Test that image formats outside the allowed list are rejected"""
+        res = self._upload(format='BMP', suffix='.bmp')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'],
+                         ['Unsupported image format BMP.'])
+
     def test_filter_recipe_by_tags(self):
         """Test returning recipes with specific tags"""
         recipe1 = sample_recipe(user=self.user,
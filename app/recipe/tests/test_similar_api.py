@@ -0,0 +1,125 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe import index
+
+
+def similar_url(recipe_id):
+    """Return URL for recipes similar to a recipe"""
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class PrivateSimilarApiTests(TestCase):
+    """Test the similar recipes API"""
+
+    def setUp(self):
+        index.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.spicy = Tag.objects.create(user=self.user, name='Spicy')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+        self.tofu = Ingredient.objects.create(user=self.user, name='Tofu')
+
+        self.curry = self.sample_recipe('Curry', [self.vegan, self.spicy],
+                                        [self.rice, self.tofu])
+        self.stir_fry = self.sample_recipe('Stir fry', [self.vegan],
+                                           [self.rice, self.tofu])
+        self.chili = self.sample_recipe('Chili', [self.spicy], [])
+        self.cake = self.sample_recipe('Cake', [], [])
+
+    def sample_recipe(self, title, tags, ingredients):
+        recipe = Recipe.objects.create(user=self.user, title=title,
+                                       time_minutes=10, price=5)
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def get_scores(self, recipe, **params):
+        res = self.client.get(similar_url(recipe.id), params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(item['title'], round(item['score'], 3))
+                for item in res.data]
+
+    def test_similar_jaccard(self):
+        """Test ranking recipes by shared tags and ingredients"""
+        self.assertEqual(self.get_scores(self.curry), [
+            ('Stir fry', 0.75),
+            ('Chili', 0.25),
+        ])
+
+    def test_similar_cosine(self):
+        """Test ranking recipes with cosine similarity"""
+        self.assertEqual(self.get_scores(self.curry, metric='cosine'), [
+            ('Stir fry', 0.866),
+            ('Chili', 0.5),
+        ])
+
+    def test_similar_limit(self):
+        """Test limiting the number of similar recipes"""
+        self.assertEqual(self.get_scores(self.curry, limit=1),
+                         [('Stir fry', 0.75)])
+
+    def test_similar_follows_changes(self):
+        """Test the index is updated from recipe and tag changes"""
+        self.get_scores(self.curry)
+        built_at = index.recipe_index(self.user).built_at
+
+        self.client.patch(detail_url(self.chili.id), {
+            'tags': [self.vegan.id, self.spicy.id],
+            'ingredients': [self.rice.id, self.tofu.id],
+        }, format='json')
+        self.stir_fry.delete()
+
+        self.assertEqual(self.get_scores(self.curry), [('Chili', 1.0)])
+
+        self.spicy.delete()
+        self.assertEqual(self.get_scores(self.curry), [('Chili', 1.0)])
+        self.assertEqual(self.get_scores(self.chili), [('Curry', 1.0)])
+        self.assertEqual(index.recipe_index(self.user).built_at, built_at)
+
+    def test_similar_query_count(self):
+        """Test a refreshed index answers with a fixed number of queries"""
+        self.get_scores(self.curry)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get_scores(self.curry)
+
+        # Recipe lookup, cursor change, change log behind and after it,
+        # recipes and their two relations
+        self.assertEqual(len(queries), 7)
+
+    def test_similar_other_user_recipe(self):
+        """Test that other users' recipes are not found"""
+        other = get_user_model().objects.create_user('other@bocon.cloud')
+        recipe = Recipe.objects.create(user=other, title='Soup',
+                                       time_minutes=5, price=5)
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_similar_invalid_params(self):
+        """Test that unknown metrics and bad limits are rejected"""
+        for params in ({'metric': 'euclid'}, {'limit': 0},
+                       {'limit': 'all'}):
+            res = self.client.get(similar_url(self.curry.id), params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
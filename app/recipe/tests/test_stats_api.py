@@ -0,0 +1,77 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Latte',
+        'time_minutes': 10,
+        'price': 5.5
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PrivateStatsApiTests(TestCase):
+    """Test the recipe statistics API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_stats(self):
+        """Test that aggregates cover the user's recipes only"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dessert = Tag.objects.create(user=self.user, name='Dessert')
+        sample_recipe(user=self.user, time_minutes=10, price=4)
+        sample_recipe(user=self.user, time_minutes=30, price=12).tags.add(
+            vegan
+        )
+        other = get_user_model().objects.create_user(
+            email='test2@bocon.cloud',
+            password='testPass2'
+        )
+        sample_recipe(user=other, time_minutes=100, price=99)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['time_minutes'],
+                         {'avg': 20, 'min': 10, 'max': 30})
+        self.assertEqual(res.data['price']['avg'], '8.00')
+        self.assertEqual(
+            [bucket['count'] for bucket in res.data['price']['distribution']],
+            [1, 0, 1, 0, 0]
+        )
+        self.assertEqual(res.data['tags'], [
+            {'id': vegan.id, 'name': 'Vegan', 'recipe_count': 1},
+            {'id': dessert.id, 'name': 'Dessert', 'recipe_count': 0},
+        ])
+
+    def test_stats_empty(self):
+        """Test statistics for a user without recipes"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['price']['avg'])
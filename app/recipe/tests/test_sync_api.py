@@ -0,0 +1,157 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, Recipe, Tag, Ingredient
+
+
+SYNC_URL = reverse('recipe:sync')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Latte',
+        'time_minutes': 10,
+        'price': 5.5
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicSyncApiTests(TestCase):
+    """Test the public sync API"""
+
+    def test_login_required(self):
+        """Test that login is required for syncing"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+    """Test the authorized sync API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass',
+            name='Test'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_full_snapshot(self):
+        """Test that syncing without a token returns everything"""
+        recipe = sample_recipe(user=self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes']['changed'][0]['id'], recipe.id)
+        self.assertEqual(len(res.data['tags']['changed']), 1)
+        self.assertEqual(res.data['ingredients']['changed'], [])
+        self.assertTrue(res.data['token'])
+
+    @override_settings(CHANGE_LOG_OVERLAP=0)
+    def test_delta_since_token(self):
+        """Test that only changes after the token are returned"""
+        sample_recipe(user=self.user, title='Old')
+        token = self.client.get(SYNC_URL).data['token']
+
+        recipe = sample_recipe(user=self.user, title='New')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        ingredient_id = ingredient.id
+        ingredient.delete()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['recipes']['changed']), 1)
+        self.assertEqual(res.data['recipes']['changed'][0]['tags'], [tag.id])
+        self.assertEqual(res.data['tags']['changed'][0]['name'], 'Vegan')
+        self.assertEqual(res.data['ingredients']['changed'], [])
+        self.assertEqual(res.data['ingredients']['deleted'], [ingredient_id])
+
+        res = self.client.get(SYNC_URL, {'since': res.data['token']})
+        self.assertEqual(res.data['recipes'], {'changed': [], 'deleted': []})
+
+    def test_late_committed_change_returned(self):
+        """Test a change committed after a later one's token is returned"""
+        late = sample_recipe(user=self.user, title='Late')
+        change = Change.objects.get(model=Change.RECIPE, object_id=late.id)
+        # Not yet committed when the next change is read as the token
+        change.delete()
+        sample_recipe(user=self.user, title='Early')
+        token = self.client.get(SYNC_URL).data['token']
+        change.save()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertIn(late.id, [recipe['id'] for recipe
+                                in res.data['recipes']['changed']])
+
+    def test_pruned_token(self):
+        """Test that a token whose change was pruned is rejected"""
+        sample_recipe(user=self.user)
+        token = self.client.get(SYNC_URL).data['token']
+        Change.objects.filter(id=token).delete()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tags_created_by_name_are_synced(self):
+        """Test that tags created inline with a recipe appear in the delta"""
+        token = self.client.get(SYNC_URL).data['token']
+        payload = {
+            'title': 'Salad',
+            'time_minutes': 5,
+            'price': 3,
+            'tags': ['Vegan'],
+            'ingredients': ['Lettuce']
+        }
+        self.client.post(reverse('recipe:recipe-list'), payload,
+                         format='json')
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['tags']['changed'][0]['name'], 'Vegan')
+        self.assertEqual(res.data['ingredients']['changed'][0]['name'],
+                         'Lettuce')
+
+    def test_changes_limited_to_user(self):
+        """Test that other users' changes are not returned"""
+        token = self.client.get(SYNC_URL).data['token']
+        user2 = get_user_model().objects.create_user(
+            email='test2@bocon.cloud',
+            password='testPass2'
+        )
+        sample_recipe(user=user2)
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['recipes']['changed'], [])
+
+    def test_invalid_token(self):
+        """Test that a malformed token is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_deletion_cascades(self):
+        """Test that deleting a user removes its objects and change log"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        self.user.delete()
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Change.objects.exists())
@@ -28,14 +28,17 @@ class PublicApiTests(TestCase):
 class PrivateApiTests(TestCase):
     """Test the authorized Tag APIs"""
 
-    def setUp(self):
-        """Before testing"""
-        self.client = APIClient()
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             email='test@bocon.cloud',
             password='TestPass',
             name='Testing'
         )
+
+    def setUp(self):
+        """Before testing"""
+        self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
     def test_retrieve_tags(self):
@@ -105,6 +108,14 @@ class PrivateApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_tag_duplicate_name(self):
+        """Test that a user cannot create two tags with the same name"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(TAG_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_retrieve_tags_assigned_to_recipe(self):
         """Test filtering tags by those assigned to recipes"""
         tag1 = Tag.objects.create(user=self.user, name='Breakfast')
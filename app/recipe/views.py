@@ -1,13 +1,29 @@
+from decimal import Decimal
+
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Tag, Ingredient, Recipe
+from core.models import Tag, Ingredient, Recipe, Change, changes_since
+
+from user.authentication import ExpiringTokenAuthentication
 
 from recipe import serializers
+from recipe.index import recipe_index
+from recipe.stats import recipe_stats
+
+
+def _finite_decimal(value):
+    """Convert a query param to a finite Decimal"""
+    number = Decimal(value)
+    if not number.is_finite():
+        raise ValueError(value)
+    return number
 
 
 class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
@@ -15,7 +31,7 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
                             mixins.CreateModelMixin
                             ):
     """Base viewset for user owned attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -45,20 +61,152 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Manage recipes in database"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
+    throttle_scope = None
+    relation_fields = ('tags', 'ingredients')
+    ordering_fields = ('id', 'title', 'time_minutes', 'price')
+    range_filters = (
+        ('min_time', 'time_minutes__gte', int),
+        ('max_time', 'time_minutes__lte', int),
+        ('min_price', 'price__gte', _finite_decimal),
+        ('max_price', 'price__lte', _finite_decimal),
+    )
+    included_serializers = {
+        'tags': serializers.TagSerializer,
+        'ingredients': serializers.IngredientSerializer,
+    }
+    similarity_metrics = ('jaccard', 'cosine')
+    max_limit = 100
 
     def _params_to_ints(self, qs):
         """Convert a list of string IDs to a list of integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _params_to_list(self, name):
+        """Convert a comma separated query param to a list of names"""
+        value = self.request.query_params.get(name, '')
+        return [item for item in value.split(',') if item]
+
+    def _get_limit(self, default):
+        """Return the limit query param, capped at max_limit"""
+        try:
+            limit = int(self.request.query_params.get('limit', default))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.max_limit:
+            raise ValidationError({
+                'limit': [f'Limit must be between 1 and {self.max_limit}']
+            })
+        return limit
+
+    def _ranked(self, ranking, key):
+        """Serialize the recipes of (value, recipe id) pairs in order"""
+        recipes = self.queryset.filter(
+            user=self.request.user,
+            id__in=[recipe_id for _, recipe_id in ranking]
+        ).prefetch_related(*self.relation_fields).in_bulk()
+
+        data = []
+        for value, recipe_id in ranking:
+            if recipe_id in recipes:
+                item = self.get_serializer(recipes[recipe_id]).data
+                item[key] = value
+                data.append(item)
+        return data
+
+    def _selected_fields(self):
+        """Return the fields requested with fields/exclude, if any"""
+        if self.action not in ('list', 'retrieve'):
+            return None
+
+        fields = self._params_to_list('fields')
+        exclude = self._params_to_list('exclude')
+        if not fields and not exclude:
+            return None
+
+        available = self.get_serializer_class().Meta.fields
+        unknown = set(fields + exclude) - set(available)
+        if unknown:
+            raise ValidationError({
+                'fields': [f'Unknown field: {name}' for name in
+                           sorted(unknown)]
+            })
+
+        return [name for name in available
+                if (not fields or name in fields) and name not in exclude]
+
+    def _included_relations(self):
+        """Return the relations requested with include, if any"""
+        if self.action != 'list':
+            return []
+
+        include = self._params_to_list('include')
+        unknown = set(include) - set(self.included_serializers)
+        if unknown:
+            raise ValidationError({
+                'include': [f'Unknown relation: {name}' for name in
+                            sorted(unknown)]
+            })
+
+        return include
+
+    def _side_load(self, recipes, include):
+        """Return the deduplicated related objects of recipes"""
+        included = {}
+        for name in include:
+            objects = {}
+            for recipe in recipes:
+                for obj in getattr(recipe, name).all():
+                    objects.setdefault(obj.id, obj)
+            included[name] = self.included_serializers[name](
+                objects.values(),
+                many=True
+            ).data
+
+        return included
+
+    def _get_ordering(self):
+        """Return the whitelisted ordering param, defaulting to -id"""
+        ordering = self.request.query_params.get('ordering', '').strip() \
+            or '-id'
+        if ordering.lstrip('-') not in self.ordering_fields:
+            raise ValidationError({
+                'ordering': [f'Ordering must be one of: '
+                             f'{", ".join(self.ordering_fields)}']
+            })
+
+        # Break ties on id so pages are stable, matching the indexes
+        descending = ordering.startswith('-')
+        tie_breaker = '-id' if descending else 'id'
+        return [ordering] if ordering in ('id', '-id') \
+            else [ordering, tie_breaker]
+
+    def _filter_ranges(self, queryset):
+        """Apply the time, price and title prefix filters"""
+        params = self.request.query_params
+        for param, lookup, convert in self.range_filters:
+            value = params.get(param)
+            if value is None:
+                continue
+            try:
+                queryset = queryset.filter(**{lookup: convert(value)})
+            except (ValueError, ArithmeticError):
+                raise ValidationError({param: ['A valid number is required']})
+
+        title_prefix = params.get('title_prefix')
+        if title_prefix:
+            queryset = queryset.filter(title__istartswith=title_prefix)
+
+        return queryset
+
     def get_queryset(self):
         """Retrieve recipes of authenticated user only"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        queryset = self._filter_ranges(self.queryset)
 
         if tags:
             tag_ids = self._params_to_ints(tags)
@@ -67,9 +215,45 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ingredient_ids = self._params_to_ints(ingredients)
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
 
+        fields = self._selected_fields()
+        include = self._included_relations()
+        if fields is None:
+            relations = self.relation_fields
+        else:
+            relations = [name for name in self.relation_fields
+                         if name in fields or name in include]
+            queryset = queryset.only('id', *[name for name in fields
+                                             if name not in relations])
+
         return queryset.filter(
             user=self.request.user
-        ).order_by('-id')
+        ).prefetch_related(*relations).order_by(*self._get_ordering())
+
+    def list(self, request, *args, **kwargs):
+        """List recipes, side-loading related objects given in include"""
+        include = self._included_relations()
+        if not include:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        recipes = list(queryset if page is None else page)
+        data = {
+            'data': self.get_serializer(recipes, many=True).data,
+            'included': self._side_load(recipes, include),
+        }
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def get_serializer(self, *args, **kwargs):
+        """Return serializer limited to the requested fields"""
+        fields = self._selected_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -84,7 +268,62 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """Return aggregate statistics over the user's recipes"""
+        return Response(recipe_stats(request.user))
+
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """Return the user's recipes sharing the most tags and ingredients"""
+        recipe = get_object_or_404(self.queryset, pk=pk, user=request.user)
+        metric = request.query_params.get('metric', 'jaccard')
+        if metric not in self.similarity_metrics:
+            raise ValidationError({
+                'metric': [f'Metric must be one of: '
+                           f'{", ".join(self.similarity_metrics)}']
+            })
+
+        ranking = recipe_index(request.user).similar(
+            recipe.id,
+            metric=metric,
+            limit=self._get_limit(10)
+        )
+        return Response(self._ranked(ranking, 'score'))
+
+    @action(methods=['GET'], detail=False)
+    def cookable(self, request):
+        """Return recipes made only from the ingredients in `have`
+
+        With `max_missing`, recipes lacking up to that many ingredients are
+        included too, those missing the fewest first.
+        """
+        params = request.query_params
+        try:
+            have = self._params_to_ints(params.get('have', ''))
+        except ValueError:
+            raise ValidationError({
+                'have': ['A comma separated list of ingredient ids is '
+                         'required']
+            })
+        try:
+            max_missing = int(params.get('max_missing', 0))
+        except ValueError:
+            max_missing = -1
+        if max_missing < 0:
+            raise ValidationError({
+                'max_missing': ['A non-negative integer is required']
+            })
+
+        ranking = recipe_index(request.user).cookable(
+            have,
+            max_missing=max_missing,
+            limit=self._get_limit(50)
+        )
+        return Response(self._ranked(ranking, 'missing'))
+
+    @action(methods=['POST'], detail=True, url_path='upload-image',
+            throttle_scope='upload')
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe"""
         recipe = self.get_object()
@@ -95,12 +334,110 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             serializer.save()
-            return Response(
+            response = Response(
                 serializer.data,
                 status=status.HTTP_200_OK
             )
+        else:
+            response = Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        return Response(
-            serializer.errors,
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        validation_time = serializer.fields['image'].validation_time
+        if validation_time is not None:
+            response['Server-Timing'] = \
+                f'image-validation;dur={validation_time * 1000:.3f}'
+        return response
+
+
+class SyncView(APIView):
+    """Return recipes, tags and ingredients changed since a sync token
+
+    Without `since` a full snapshot is returned. Either way the response
+    carries the token to send on the next sync. Objects changed shortly
+    before the token may be returned again, and a token older than
+    CHANGE_LOG_RETENTION needs a new snapshot.
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    sync_limit = 1000
+    collections = (
+        ('recipes', Change.RECIPE, Recipe, serializers.RecipeSerializer),
+        ('tags', Change.TAG, Tag, serializers.TagSerializer),
+        ('ingredients', Change.INGREDIENT, Ingredient,
+         serializers.IngredientSerializer),
+    )
+
+    def _get_since(self):
+        """Return the since token as an integer, or None for a snapshot"""
+        since = self.request.query_params.get('since')
+        if not since:
+            return None
+        try:
+            return int(since)
+        except ValueError:
+            raise ValidationError({'since': ['Invalid sync token']})
+
+    def _latest_changes(self, since):
+        """Return the last change per object after since and the cursor"""
+        changes = changes_since(self.request.user.pk, since,
+                                self.sync_limit)
+        if changes is None:
+            raise ValidationError({
+                'since': ['Sync token expired, sync again without since']
+            })
+        late, changes = changes
+
+        has_more = len(changes) > self.sync_limit
+        changes = changes[:self.sync_limit]
+        latest = {}
+        for change_id, model, object_id, deleted in late + changes:
+            latest[(model, object_id)] = deleted
+
+        cursor = changes[-1][0] if changes else since
+        return latest, cursor, has_more
+
+    def _objects(self, model):
+        """Return the queryset of model owned by the user"""
+        queryset = model.objects.filter(user=self.request.user)
+        if model is Recipe:
+            queryset = queryset.prefetch_related('tags', 'ingredients')
+        return queryset
+
+    def get(self, request, *args, **kwargs):
+        since = self._get_since()
+        data = {}
+
+        if since is None:
+            last = Change.objects.filter(user=request.user).order_by(
+                '-id'
+            ).values_list('id', flat=True).first()
+            for name, _, model, serializer_class in self.collections:
+                data[name] = {
+                    'changed': serializer_class(
+                        self._objects(model).order_by('id'), many=True
+                    ).data,
+                    'deleted': [],
+                }
+            data['token'] = str(last or 0)
+            data['has_more'] = False
+            return Response(data)
+
+        latest, cursor, has_more = self._latest_changes(since)
+        for name, key, model, serializer_class in self.collections:
+            ids = {object_id for (change_model, object_id), deleted
+                   in latest.items() if change_model == key and not deleted}
+            deleted = {object_id for (change_model, object_id), deleted
+                       in latest.items() if change_model == key and deleted}
+            objects = list(
+                self._objects(model).filter(id__in=ids).order_by('id')
+            )
+            deleted |= ids - {obj.id for obj in objects}
+            data[name] = {
+                'changed': serializer_class(objects, many=True).data,
+                'deleted': sorted(deleted),
+            }
+        data['token'] = str(cursor)
+        data['has_more'] = has_more
+        return Response(data)
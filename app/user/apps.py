@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class UserConfig(AppConfig):
     name = 'user'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from user.authentication import invalidate_cached_user
+
+        user_model = get_user_model()
+        post_save.connect(invalidate_cached_user, sender=user_model)
+        post_delete.connect(invalidate_cached_user, sender=user_model)
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import authentication, exceptions
+
+from core import metrics
+from user import tokens
+
+
+USER_CACHE_KEY = 'user.authentication.user:{}'
+
+
+def user_cache_key(user_id):
+    """Return the cache key holding the user with user_id"""
+    return USER_CACHE_KEY.format(user_id)
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop a saved or deleted user from the authentication cache"""
+    cache.delete(user_cache_key(instance.pk))
+
+
+def _get_user(user_id):
+    """Return the active user with user_id, served from cache if possible"""
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        cache.set(key, user, settings.ACCESS_TOKEN_LIFETIME)
+
+    return user if user.is_active else None
+
+
+class ExpiringTokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate with signed access tokens from the token endpoint
+
+    Clients send `Authorization: Token <access token>`. The token is
+    verified by signature, age and the in-memory revocation set, and the
+    user is loaded from cache, so a valid request needs no DB query.
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            metrics.token_auth.inc(outcome='malformed')
+            msg = _('Invalid token header.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            metrics.token_auth.inc(outcome='malformed')
+            msg = _('Invalid token header.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, token):
+        try:
+            payload = tokens.verify_access_token(token)
+        except tokens.InvalidToken as exc:
+            metrics.token_auth.inc(outcome='invalid')
+            raise exceptions.AuthenticationFailed(str(exc))
+
+        user = _get_user(payload['uid'])
+        if user is None:
+            metrics.token_auth.inc(outcome='inactive')
+            msg = _('User inactive or deleted.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        metrics.token_auth.inc(outcome='success')
+        return (user, payload)
+
+    def authenticate_header(self, request):
+        return self.keyword
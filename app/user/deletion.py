@@ -0,0 +1,140 @@
+import json
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.utils import timezone
+
+from core import jobs
+from core.models import AccountDeletion, Change, Ingredient, Recipe, \
+                        RefreshToken, Tag, delete_unused_images
+
+from user import tokens
+
+
+TASK_NAME = 'user.delete_account'
+
+
+def request_deletion(user):
+    """Deactivate user and queue the removal of their data
+
+    The user's tokens are revoked, so they can no longer authenticate with
+    any process once it has synced its revocations. Their data is removed
+    by the `user.delete_account` job; the returned AccountDeletion tracks
+    its progress.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        tokens.revoke_user_tokens(user)
+        deletion, _ = AccountDeletion.objects.get_or_create(
+            user_id=user.pk,
+            defaults={'email': user.email}
+        )
+        jobs.enqueue(TASK_NAME, {'user_id': user.pk},
+                     key=f'{TASK_NAME}:{user.pk}')
+
+    return deletion
+
+
+def raw_delete(queryset):
+    """Delete the rows of queryset in one statement, returning the count
+
+    No objects are loaded, no signals are sent and nothing cascades.
+    """
+    return queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+def delete_batch(queryset, batch_size, dependents=(), fields=()):
+    """Delete up to batch_size rows of queryset and the rows pointing at them
+
+    `dependents` are (model, field) pairs whose rows referencing the batch
+    are deleted first. Returns the pk and `fields` values of the deleted
+    rows and the number of rows deleted per table.
+    """
+    model = queryset.model
+    counts = Counter()
+    with transaction.atomic():
+        rows = list(queryset.order_by('pk').values_list('pk', *fields)
+                    [:batch_size])
+        if not rows:
+            return rows, counts
+
+        pks = [row[0] for row in rows]
+        for dependent, field in dependents:
+            counts[dependent._meta.db_table] += raw_delete(
+                dependent._base_manager.filter(**{f'{field}__in': pks})
+            )
+        counts[model._meta.db_table] += raw_delete(
+            model._base_manager.filter(pk__in=pks)
+        )
+
+    return rows, counts
+
+
+def remove_images(names):
+    """Delete the image files no recipe refers to any more
+
+    Other users may share a file, so ones modified within MEDIA_MIN_AGE,
+    which an upload may be reusing, are left to collect_media.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    names = [name for name in set(names) if name and storage.exists(name)]
+    cutoff = timezone.now() - timedelta(seconds=settings.MEDIA_MIN_AGE)
+    return len(delete_unused_images(storage, names, cutoff))
+
+
+def delete_account(user_id, batch_size=None):
+    """Remove a deactivated user and everything they own in batches
+
+    Recipes, tags and ingredients are deleted batch_size at a time together
+    with their M2M rows, each batch in its own short transaction, so large
+    accounts neither hold locks for long nor get loaded into memory.
+    Progress is saved after every batch, and a run that was interrupted
+    picks up where it stopped.
+    """
+    batch_size = batch_size or settings.ACCOUNT_DELETION_BATCH_SIZE
+    deletion = AccountDeletion.objects.get(user_id=user_id)
+    if deletion.status == AccountDeletion.DONE:
+        return deletion
+
+    progress = Counter(json.loads(deletion.progress))
+    deletion.status = AccountDeletion.RUNNING
+    deletion.save(update_fields=['status'])
+
+    def report(counts):
+        progress.update(counts)
+        deletion.progress = json.dumps(progress, sort_keys=True)
+        deletion.save(update_fields=['progress'])
+
+    recipe_tags = Recipe.tags.through
+    recipe_ingredients = Recipe.ingredients.through
+    steps = [
+        (Recipe, [(recipe_tags, 'recipe'), (recipe_ingredients, 'recipe')],
+         ['image']),
+        (Tag, [(recipe_tags, 'tag')], []),
+        (Ingredient, [(recipe_ingredients, 'ingredient')], []),
+        (Change, [], []),
+        (RefreshToken, [], []),
+    ]
+    for model, dependents, fields in steps:
+        queryset = model._base_manager.filter(user_id=user_id)
+        while True:
+            rows, counts = delete_batch(queryset, batch_size, dependents,
+                                        fields)
+            if not rows:
+                break
+            if model is Recipe:
+                counts['images'] = remove_images(row[1] for row in rows)
+            report(counts)
+
+    # Only small tables such as permissions and admin log entries are left,
+    # so the regular cascade removes the rest and sends the usual signals
+    get_user_model()._base_manager.filter(pk=user_id).delete()
+
+    deletion.status = AccountDeletion.DONE
+    deletion.finished = timezone.now()
+    deletion.save(update_fields=['status', 'finished'])
+    return deletion
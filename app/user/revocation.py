@@ -0,0 +1,103 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import RevokedToken
+
+
+class BloomFilter:
+    """Fixed size bloom filter over string keys"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        ))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        """Yield the bit positions for key using double hashing"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(key)
+        )
+
+
+class RevocationSet:
+    """In-process view of the revoked token table
+
+    The bloom filter answers the common "not revoked" case without touching
+    the exact set, which only confirms possible hits. The table is polled
+    for new rows at most once per TOKEN_REVOCATION_SYNC_INTERVAL seconds.
+    Each poll reloads rows created up to TOKEN_REVOCATION_SYNC_OVERLAP
+    seconds before the previous one, so rows committed late by a slow
+    transaction are still picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Drop all state so the next lookup reloads from the table"""
+        self._capacity = settings.TOKEN_REVOCATION_CAPACITY
+        self._bloom = BloomFilter(self._capacity)
+        self._exact = set()
+        self._since = None
+        self._synced_at = None
+
+    def _add(self, jti):
+        self._bloom.add(jti)
+        self._exact.add(jti)
+
+    def add(self, jti):
+        """Record a revocation made by this process"""
+        with self._lock:
+            self._add(jti)
+
+    def sync(self):
+        """Load revocations added to the table since the last sync"""
+        with self._lock:
+            if len(self._exact) >= self._capacity:
+                self.clear()
+            now = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=now)
+            if self._since is not None:
+                rows = rows.filter(created__gte=self._since - timedelta(
+                    seconds=settings.TOKEN_REVOCATION_SYNC_OVERLAP
+                ))
+            for jti in rows.values_list('jti', flat=True):
+                self._add(jti)
+            self._since = now
+            self._synced_at = time.monotonic()
+
+    def _is_stale(self):
+        interval = settings.TOKEN_REVOCATION_SYNC_INTERVAL
+        return (self._synced_at is None or
+                time.monotonic() - self._synced_at >= interval)
+
+    def __contains__(self, jti):
+        if self._is_stale():
+            self.sync()
+        if jti not in self._bloom:
+            return False
+        return jti in self._exact
+
+
+revocations = RevocationSet()
@@ -58,3 +58,8 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for exchanging or revoking a refresh token"""
+    refresh = serializers.CharField(trim_whitespace=False)
@@ -0,0 +1,8 @@
+from core.jobs import task
+from user import deletion
+
+
+@task(deletion.TASK_NAME)
+def delete_account(user_id):
+    """Remove a deactivated user's data"""
+    deletion.delete_account(user_id)
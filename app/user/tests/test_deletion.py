@@ -0,0 +1,168 @@
+import json
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_delete
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import AccountDeletion, Change, Ingredient, Job, Recipe, \
+                        Tag
+from user import deletion, tasks, tokens
+from user.authentication import user_cache_key
+from user.revocation import revocations
+
+
+ME_URL = reverse('user:me')
+
+
+def create_user(email):
+    return get_user_model().objects.create_user(email, 'testPass')
+
+
+def sample_recipe(user, title='Toast', image=None):
+    recipe = Recipe.objects.create(user=user, title=title, time_minutes=5,
+                                   price=2)
+    if image is not None:
+        recipe.image.save('photo.jpg', ContentFile(image))
+    return recipe
+
+
+class AccountDeletionApiTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test@bocon.cloud')
+        self.client = APIClient()
+
+    def test_delete_deactivates_and_queues(self):
+        """Test that deleting the account deactivates it right away"""
+        token = tokens.issue_token_pair(self.user)['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data, {'status': AccountDeletion.PENDING})
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        job = Job.objects.get()
+        self.assertEqual(job.name, deletion.TASK_NAME)
+        self.assertEqual(json.loads(job.payload), {'user_id': self.user.pk})
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_delete_revokes_tokens_in_other_processes(self):
+        """Test that a process with a stale user cache rejects the tokens"""
+        pair = tokens.issue_token_pair(self.user)
+        active = get_user_model().objects.get(pk=self.user.pk)
+
+        deletion.request_deletion(self.user)
+        # Another process still caches the active user and has not seen
+        # the revocation yet
+        cache.set(user_cache_key(self.user.pk), active)
+        revocations.clear()
+        self.addCleanup(cache.delete, user_cache_key(self.user.pk))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {pair["token"]}')
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.refresh_token_pair(pair['refresh'])
+
+    def test_request_deletion_idempotent(self):
+        """Test that requesting deletion twice queues one job"""
+        first = deletion.request_deletion(self.user)
+        second = deletion.request_deletion(self.user)
+
+        self.assertEqual(first, second)
+        self.assertEqual(Job.objects.count(), 1)
+
+
+@override_settings(DEFAULT_FILE_STORAGE='core.tests.storage.InMemoryStorage')
+class DeleteAccountTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test@bocon.cloud')
+        self.other = create_user('other@bocon.cloud')
+        self.shared = sample_recipe(self.other, image=b'shared')
+
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}')
+                for i in range(3)]
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        for i in range(5):
+            recipe = sample_recipe(self.user, f'Recipe {i}',
+                                   image=b'shared' if i == 0 else b'own')
+            recipe.tags.set(tags)
+            recipe.ingredients.add(ingredient)
+        self.own_image = Recipe.objects.filter(user=self.user).last().image
+        self.storage = self.own_image.storage
+        for name in self.storage.files:
+            self.storage.modified[name] = timezone.now() - timedelta(days=2)
+        tokens.issue_token_pair(self.user)
+        deletion.request_deletion(self.user)
+
+    def test_delete_account(self):
+        """Test that the account and everything it owns is removed"""
+        result = deletion.delete_account(self.user.pk, batch_size=2)
+
+        self.assertEqual(result.status, AccountDeletion.DONE)
+        self.assertIsNotNone(result.finished)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        for model in (Recipe, Tag, Ingredient, Change):
+            self.assertFalse(model.objects.filter(user=self.user).exists())
+        self.assertFalse(Recipe.tags.through.objects.exists())
+        self.assertEqual(list(Recipe.objects.all()), [self.shared])
+
+        self.assertFalse(self.storage.exists(self.own_image.name))
+        self.assertTrue(self.storage.exists(self.shared.image.name))
+
+        progress = json.loads(result.progress)
+        self.assertEqual(progress['core_recipe'], 5)
+        self.assertEqual(progress['core_recipe_tags'], 15)
+        self.assertEqual(progress['core_recipe_ingredients'], 5)
+        self.assertEqual(progress['core_tag'], 3)
+        self.assertEqual(progress['images'], 1)
+
+    def test_recently_reused_image_kept(self):
+        """Test that an image an upload may be reusing is left in place"""
+        # Another user's upload of the same content touched the file and
+        # has not saved its recipe yet
+        self.storage.touch(self.own_image.name)
+
+        result = deletion.delete_account(self.user.pk, batch_size=2)
+
+        self.assertTrue(self.storage.exists(self.own_image.name))
+        self.assertEqual(json.loads(result.progress).get('images', 0), 0)
+
+    def test_rows_deleted_without_signals(self):
+        """Test that owned rows are bulk deleted without loading them"""
+        receiver = MagicMock()
+        post_delete.connect(receiver, sender=Recipe)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Recipe)
+
+        deletion.delete_account(self.user.pk, batch_size=2)
+
+        receiver.assert_not_called()
+
+    def test_delete_account_job(self):
+        """Test that the queued job carries out the deletion"""
+        self.assertIn(deletion.TASK_NAME, jobs.registry)
+        self.assertIs(jobs.registry[deletion.TASK_NAME],
+                      tasks.delete_account)
+
+        jobs.work(burst=True)
+
+        self.assertEqual(AccountDeletion.objects.get().status,
+                         AccountDeletion.DONE)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
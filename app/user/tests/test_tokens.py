@@ -0,0 +1,105 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core import signing
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.models import RevokedToken
+
+from user import tokens
+from user.revocation import BloomFilter, revocations
+
+
+class BloomFilterTests(TestCase):
+
+    def test_added_keys_are_members(self):
+        """Test that keys added to the filter are always found"""
+        bloom = BloomFilter(capacity=1000)
+        keys = [f'key-{i}' for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+
+    def test_false_positive_rate(self):
+        """Test that unknown keys are mostly reported as absent"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'key-{i}')
+
+        hits = sum(f'other-{i}' in bloom for i in range(10000))
+
+        self.assertLess(hits, 300)
+
+
+class AccessTokenTests(TestCase):
+
+    def setUp(self):
+        revocations.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@bocon.cloud',
+            password='testPass'
+        )
+
+    def test_verify_access_token_no_query(self):
+        """Test that verifying a token does not query the database"""
+        token = tokens.issue_access_token(self.user)
+        revocations.sync()
+
+        with self.assertNumQueries(0):
+            payload = tokens.verify_access_token(token)
+
+        self.assertEqual(payload['uid'], self.user.pk)
+
+    def test_expired_access_token(self):
+        """Test that access tokens older than their lifetime are rejected"""
+        token = tokens.issue_access_token(self.user)
+
+        with patch('django.core.signing.time.time', return_value=1e12):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify_access_token(token)
+
+    def test_tampered_access_token(self):
+        """Test that a token with a modified payload is rejected"""
+        token = tokens.issue_access_token(self.user)
+        forged = signing.dumps({'uid': 999, 'jti': 'x'}, salt='other')
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify_access_token(token[:-2] + 'xx')
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify_access_token(forged)
+
+    def test_revocation_synced_from_table(self):
+        """Test that revocations by other processes are picked up on sync"""
+        token = tokens.issue_access_token(self.user)
+        payload = tokens.verify_access_token(token)
+        RevokedToken.objects.create(
+            jti=payload['jti'],
+            expires_at='2999-01-01T00:00:00Z'
+        )
+
+        revocations.sync()
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify_access_token(token)
+
+    def test_revocation_committed_late_synced(self):
+        """Test that a row created before the last sync is still loaded"""
+        token = tokens.issue_access_token(self.user)
+        payload = tokens.verify_access_token(token)
+        revocations.sync()
+        # A slow transaction commits a row created before that sync
+        RevokedToken.objects.create(
+            jti=payload['jti'],
+            expires_at='2999-01-01T00:00:00Z'
+        )
+        RevokedToken.objects.filter(jti=payload['jti']).update(
+            created=timezone.now() - timedelta(seconds=10)
+        )
+
+        revocations.sync()
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify_access_token(token)
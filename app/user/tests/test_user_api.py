@@ -8,6 +8,8 @@ from rest_framework import status
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
+TOKEN_REFRESH_URL = reverse('user:token-refresh')
+TOKEN_REVOKE_URL = reverse('user:token-revoke')
 ME_URL = reverse('user:me')
 
 
@@ -75,6 +77,65 @@ class PublicUserApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('token', res.data)
+        self.assertIn('refresh', res.data)
+        self.assertIn('expires_in', res.data)
+
+    def test_access_token_authenticates(self):
+        """Test that an issued access token authenticates requests"""
+        payload = {'email': 'test@bocon.cloud', 'password': 'testPass'}
+        create_user(**payload)
+        token = self.client.post(TOKEN_URL, payload).data['token']
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], payload['email'])
+
+    def test_refresh_token_rotates(self):
+        """Test that a refresh token can only be exchanged once"""
+        payload = {'email': 'test@bocon.cloud', 'password': 'testPass'}
+        create_user(**payload)
+        refresh = self.client.post(TOKEN_URL, payload).data['refresh']
+
+        res = self.client.post(TOKEN_REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+        self.assertNotEqual(res.data['refresh'], refresh)
+
+        res = self.client.post(TOKEN_REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoked_token_rejected(self):
+        """Test that a revoked access token no longer authenticates"""
+        payload = {'email': 'test@bocon.cloud', 'password': 'testPass'}
+        create_user(**payload)
+        data = self.client.post(TOKEN_URL, payload).data
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {data["token"]}')
+        res = self.client.post(TOKEN_REVOKE_URL, {'refresh': data['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        res = self.client.post(TOKEN_REFRESH_URL, {'refresh': data['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_token_invalid_body(self):
+        """Test that a revoke request with a malformed body is rejected"""
+        payload = {'email': 'test@bocon.cloud', 'password': 'testPass'}
+        create_user(**payload)
+        token = self.client.post(TOKEN_URL, payload).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        for body in (['refresh'], 'refresh', {'refresh': ['a', 'b']}):
+            res = self.client.post(TOKEN_REVOKE_URL, body, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_REVOKE_URL)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
 
     def test_create_token_invalid_credentials(self):
         """Test that token is not created if invalid credentials"""
@@ -0,0 +1,133 @@
+import hashlib
+import secrets
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from core.models import RefreshToken, RevokedToken
+
+from user.revocation import revocations
+
+
+ACCESS_TOKEN_SALT = 'user.tokens.access'
+
+
+class InvalidToken(Exception):
+    """Raised when a token is malformed, expired or revoked"""
+
+
+def _digest(key):
+    """Return the stored form of a refresh token key"""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def user_revocation_key(user_id):
+    """Return the revocation entry covering every access token of a user"""
+    return f'user:{user_id}'
+
+
+def issue_access_token(user):
+    """Return a signed access token for user"""
+    payload = {'uid': user.pk, 'jti': uuid.uuid4().hex}
+    return signing.dumps(payload, salt=ACCESS_TOKEN_SALT)
+
+
+def verify_access_token(token):
+    """Return the payload of a valid access token without a DB query"""
+    try:
+        payload = signing.loads(
+            token,
+            salt=ACCESS_TOKEN_SALT,
+            max_age=settings.ACCESS_TOKEN_LIFETIME
+        )
+    except signing.BadSignature:
+        raise InvalidToken('Invalid or expired token')
+
+    if payload['jti'] in revocations or \
+            user_revocation_key(payload['uid']) in revocations:
+        raise InvalidToken('Token has been revoked')
+
+    return payload
+
+
+def issue_token_pair(user):
+    """Create a refresh token for user and return it with an access token"""
+    key = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        user=user,
+        digest=_digest(key),
+        expires_at=timezone.now() + timedelta(
+            seconds=settings.REFRESH_TOKEN_LIFETIME
+        )
+    )
+
+    return {
+        'token': issue_access_token(user),
+        'refresh': key,
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def refresh_token_pair(key):
+    """Exchange a refresh token for a new token pair, rotating it"""
+    refresh = RefreshToken.objects.select_related('user').filter(
+        digest=_digest(key),
+        revoked=False,
+        expires_at__gt=timezone.now()
+    ).first()
+    if refresh is None or not refresh.user.is_active:
+        raise InvalidToken('Invalid or expired refresh token')
+
+    rotated = RefreshToken.objects.filter(
+        pk=refresh.pk,
+        revoked=False
+    ).update(revoked=True)
+    if not rotated:
+        raise InvalidToken('Invalid or expired refresh token')
+
+    return issue_token_pair(refresh.user)
+
+
+def revoke_access_token(payload):
+    """Revoke the access token described by payload"""
+    RevokedToken.objects.get_or_create(
+        jti=payload['jti'],
+        defaults={
+            'expires_at': timezone.now() + timedelta(
+                seconds=settings.ACCESS_TOKEN_LIFETIME
+            )
+        }
+    )
+    revocations.add(payload['jti'])
+
+
+def revoke_refresh_token(user, key):
+    """Revoke a refresh token of user so it can no longer be exchanged"""
+    RefreshToken.objects.filter(
+        user=user,
+        digest=_digest(key)
+    ).update(revoked=True)
+
+
+def revoke_user_tokens(user):
+    """Revoke every access and refresh token issued to user so far
+
+    Other processes pick the revocation up from the table within
+    TOKEN_REVOCATION_SYNC_INTERVAL, without relying on their user cache.
+    """
+    key = user_revocation_key(user.pk)
+    now = timezone.now()
+    RevokedToken.objects.update_or_create(
+        jti=key,
+        defaults={
+            'expires_at': now + timedelta(
+                seconds=settings.ACCESS_TOKEN_LIFETIME
+            ),
+            'created': now,
+        }
+    )
+    revocations.add(key)
+    RefreshToken.objects.filter(user=user).update(revoked=True)
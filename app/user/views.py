@@ -1,8 +1,12 @@
-from rest_framework import generics, authentication, permissions
-from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
-from user.serializers import UserSerializer, AuthTokenSerializer
+from user import deletion, tokens
+from user.authentication import ExpiringTokenAuthentication
+from user.serializers import UserSerializer, AuthTokenSerializer, \
+                             RefreshTokenSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -10,18 +14,70 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class CreateTokenView(ObtainAuthToken):
-    """Create a new auth token for user"""
+class CreateTokenView(generics.GenericAPIView):
+    """Create a new access and refresh token pair for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_scope = 'token'
 
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+        return Response(tokens.issue_token_pair(user))
+
+
+class RefreshTokenView(generics.GenericAPIView):
+    """Exchange a refresh token for a new token pair"""
+    serializer_class = RefreshTokenSerializer
+    throttle_scope = 'token'
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            pair = tokens.refresh_token_pair(
+                serializer.validated_data['refresh']
+            )
+        except tokens.InvalidToken as exc:
+            raise ValidationError({'refresh': [str(exc)]})
+
+        return Response(pair)
+
+
+class RevokeTokenView(generics.GenericAPIView):
+    """Revoke the current access token and optionally a refresh token"""
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        tokens.revoke_access_token(request.auth)
+
+        refresh = serializer.validated_data.get('refresh')
+        if refresh:
+            tokens.revoke_refresh_token(request.user, refresh)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve and return authentication user"""
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the user and delete their data in the background"""
+        account_deletion = deletion.request_deletion(request.user)
+        return Response({'status': account_deletion.status},
+                        status=status.HTTP_202_ACCEPTED)